@@ -7,12 +7,20 @@ Key points for readers unfamiliar with `BaseHTTPRequestHandler`:
 """
 
 from http.server import BaseHTTPRequestHandler
-import json, os, sys
-from typing import List, Optional
+import base64, gzip, hashlib, heapq, itertools, json, math, os, re, sqlite3, sys, tempfile, threading, uuid, weakref, zlib
+from collections import Counter, OrderedDict, defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar, copy_context
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional
+from urllib.parse import parse_qs, urlsplit
 import time
 
 from pydantic import BaseModel, ValidationError
-from openai import OpenAI
+from pydantic_core import to_json
+# `openai` is imported on first use (see `_client`): it is most of the
+# import time, and a cold start may be answered from cache without it.
 
 # ───────────────────────── Schema ──────────────────────────
 
@@ -42,13 +50,327 @@ USE_SAMPLE = False
 # Cache so the expensive OpenAI call happens only once.
 _CACHED_SAMPLE_MAP: "MindMap | None" = None
 
+# The YouTube transcript used in sample mode and by the benches.  It lives
+# in a file so cold starts do not parse it; `backend.SAMPLE_TRANSCRIPT`
+# still works and reads it on first access.
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_transcript.txt")
+
+
+def _sample_transcript() -> str:
+    global SAMPLE_TRANSCRIPT
+    if "SAMPLE_TRANSCRIPT" not in globals():
+        with open(SAMPLE_PATH, encoding="utf-8") as f:
+            SAMPLE_TRANSCRIPT = f.read().strip()
+    return SAMPLE_TRANSCRIPT
+
+
+def __getattr__(name: str):
+    if name == "SAMPLE_TRANSCRIPT":
+        return _sample_transcript()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# ─────────────────────── Metrics ───────────────────────────
+# Counters, gauges and latency histograms for every pipeline stage, served
+# in Prometheus text format from `GET …/metrics`.  Log lines carry the
+# request's trace id (the caller's X-Request-ID, or a generated one).
+
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_TRACE_ID: ContextVar[str] = ContextVar("trace_id", default="")
+
+
+def _log(*parts) -> None:
+    trace = _TRACE_ID.get()
+    print(*((f"[{trace}]",) if trace else ()), *parts, file=sys.stderr)
+
+
+class _Metrics:
+    """Thread-safe Prometheus-style registry (counters, gauges, histograms)."""
+
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Counter = Counter()
+        self._gauges: dict = {}
+        self._histograms: dict = {}   # key → [bucket counts..., sum, count]
+        self._help: dict = {}
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        with self._lock:
+            self._counters[self._key(name, labels)] += value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def add_gauge(self, name: str, delta: float, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + delta
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            h = self._histograms.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    h[i] += 1
+            h[-2] += seconds
+            h[-1] += 1
+
+    @contextmanager
+    def stage(self, stage: str):
+        """Time a `with` block into mindmap_stage_seconds{stage=…}."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("mindmap_stage_seconds", time.perf_counter() - start, stage=stage)
+
+    def render(self) -> str:
+        def fmt(name, labels, extra=()):
+            pairs = [*labels, *extra]
+            inner = ",".join(f'{k}="{v}"' for k, v in pairs)
+            return f"{name}{{{inner}}}" if inner else name
+
+        lines = []
+        with self._lock:
+            for kind, series in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted({n for n, _ in series}):
+                    lines.append(f"# TYPE {name} {kind}")
+                    lines += [f"{fmt(n, l)} {v}" for (n, l), v in sorted(series.items()) if n == name]
+            for name in sorted({n for n, _ in self._histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (n, l), h in sorted(self._histograms.items()):
+                    if n != name:
+                        continue
+                    for bound, count in zip(self.buckets, h):
+                        lines.append(f"{fmt(n + '_bucket', l, [('le', bound)])} {count}")
+                    lines.append(f"{fmt(n + '_bucket', l, [('le', '+Inf')])} {h[-1]}")
+                    lines.append(f"{fmt(n + '_sum', l)} {h[-2]}")
+                    lines.append(f"{fmt(n + '_count', l)} {h[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = _Metrics()
+
+
+def _record_usage(res) -> None:
+    usage = getattr(res, "usage", None)
+    if usage is not None:
+        METRICS.inc("mindmap_tokens_total", usage.prompt_tokens or 0, direction="in")
+        METRICS.inc("mindmap_tokens_total", usage.completion_tokens or 0, direction="out")
+
+
+# ────────────────────── Tail latency ───────────────────────
+# Every request runs against a deadline.  A model call that is slower than
+# the recent HEDGE_PERCENTILE latency gets one duplicate ("hedge") and the
+# first answer wins.  A circuit breaker stops calling a failing upstream for
+# a while; meetings are then served their last good map (see `build_map`).
+
+REQUEST_DEADLINE_S = 40
+HEDGE_PERCENTILE = 0.9
+HEDGE_MIN_SAMPLES = 20       # no hedging until we know what "slow" means
+LATENCY_WINDOW = 200         # recent call latencies kept for the percentile
+LLM_POOL_WORKERS = 64
+BREAKER_FAILURES = 5         # consecutive failures that open the circuit
+BREAKER_COOLDOWN_S = 30
+BREAKER_MIN_BUDGET_S = 10    # a timeout on a shorter budget is the caller's, not the upstream's
+GENERATION_DEADLINE_S = REQUEST_DEADLINE_S  # least a background generation gets
+
+_DEADLINE: ContextVar[float] = ContextVar("deadline", default=0.0)
+# Set when `build_map` answered with a stale map; the handler flags it.
+_STALE: ContextVar[bool] = ContextVar("stale", default=False)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's deadline passed before the model answered."""
+
+
+class CircuitOpenError(RuntimeError):
+    """The upstream is failing; calls are suspended until the cooldown ends."""
+
+    def __init__(self, message: str, retry_after: int = BREAKER_COOLDOWN_S):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _LatencyWindow:
+    def __init__(self, size: int = LATENCY_WINDOW):
+        self._samples: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> "float | None":
+        with self._lock:
+            if len(self._samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _Breaker:
+    """Closed → open after N straight failures → half-open (one probe) after
+    the cooldown → closed again on success."""
+
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown_s: float = BREAKER_COOLDOWN_S,
+                 tier: str = "quality"):
+        self.tier = tier
+        self.failures = failures
+        self.cooldown_s = cooldown_s
+        self._streak = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._streak < self.failures:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.cooldown_s:
+                return False
+            self._probing = True  # half-open: let exactly one call through
+            return True
+
+    def is_open(self) -> bool:
+        """Open and still cooling down (no side effects, unlike `allow`)."""
+        return (self._streak >= self.failures
+                and time.monotonic() - self._opened_at < self.cooldown_s)
+
+    def retry_after(self) -> int:
+        return max(1, round(self.cooldown_s - (time.monotonic() - self._opened_at)))
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            self._probing = False
+            if ok:
+                self._streak = 0
+            else:
+                self._streak += 1
+                if self._streak >= self.failures:
+                    self._opened_at = time.monotonic()
+            METRICS.set_gauge("mindmap_breaker_open", int(self._streak >= self.failures),
+                              tier=self.tier)
+
+    def release(self) -> None:
+        """Give back the half-open probe slot without a verdict."""
+        with self._lock:
+            self._probing = False
+
+    def timed_out(self, budget_s: float) -> None:
+        """A call given `budget_s` got no answer.  Only a generous budget
+        says anything about the upstream; a short one is the caller's."""
+        if budget_s >= BREAKER_MIN_BUDGET_S:
+            self.record(False)
+        else:
+            self.release()
+
+
+# Recent latencies and a breaker per model tier (see "Model routing"), so
+# a struggling quality model does not take the fast one down with it.
+_LATENCIES: "defaultdict[str, _LatencyWindow]" = defaultdict(_LatencyWindow)
+_BREAKERS: "dict[str, _Breaker]" = {}
+_LLM_POOL = ThreadPoolExecutor(max_workers=LLM_POOL_WORKERS, thread_name_prefix="llm")
+
+
+def _admit(tier: str) -> _Breaker:
+    """`tier`'s breaker, once it lets a call through (else CircuitOpenError)."""
+    breaker = _BREAKERS.get(tier) or _BREAKERS.setdefault(tier, _Breaker(tier=tier))
+    if not breaker.allow():
+        METRICS.inc("mindmap_breaker_rejections_total", tier=tier)
+        raise CircuitOpenError(f"{tier} upstream circuit open", breaker.retry_after())
+    return breaker
+
+
+def _is_timeout(err: BaseException) -> bool:
+    """A deadline or client timeout rather than an upstream error."""
+    openai = sys.modules.get("openai")
+    return isinstance(err, TimeoutError) or (openai is not None
+                                             and isinstance(err, openai.APITimeoutError))
+
+
+def _hedged(call):
+    """Run `call(timeout)` within the current deadline, hedging once if it
+    is slower than usual.  Returns the first successful result."""
+    tier = _TIER.get()
+    breaker = _admit(tier)
+    start = time.monotonic()
+    deadline = _DEADLINE.get() or start + REQUEST_DEADLINE_S
+    latencies = _LATENCIES[tier]
+
+    def attempt():
+        began = time.monotonic()
+        result = call(max(deadline - began, 0.1))
+        latencies.add(time.monotonic() - began)
+        return result
+
+    primary = _LLM_POOL.submit(copy_context().run, attempt)
+    pending, hedge = {primary}, None
+    hedge_at = latencies.percentile(HEDGE_PERCENTILE)
+    error: "BaseException | None" = None
+    while pending:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+        until = deadline
+        if hedge is None and hedge_at is not None:
+            until = min(until, start + hedge_at)
+        done, pending = wait(pending, timeout=max(until - now, 0), return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                breaker.record(True)
+                if future is hedge:
+                    METRICS.inc("mindmap_hedges_won_total")
+                return future.result()
+            error = future.exception()
+        # A hedge while calls queue for rate-limit budget would only spend more of it.
+        if (not done and hedge is None and hedge_at is not None
+                and time.monotonic() < deadline and not _backlogged()):
+            METRICS.inc("mindmap_hedges_total")
+            _log(f"🪁 hedging after {hedge_at:.1f}s")
+            hedge = _LLM_POOL.submit(copy_context().run, attempt)
+            pending.add(hedge)
+    if pending or error is None or _is_timeout(error):
+        breaker.timed_out(deadline - start)
+    else:
+        breaker.record(False)
+    if pending or error is None:
+        METRICS.inc("mindmap_deadline_exceeded_total")
+        raise DeadlineExceeded(f"no model answer within {deadline - start:.1f}s")
+    raise error
+
+
 # ────────────────── OpenAI companion function ──────────────
 
 
-CLIENT = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Built by `_client()` on the first model call; benches and tests may assign
+# a stand-in (see bench/fake_openai.py) before that.
+CLIENT = None
+_CLIENT_LOCK = threading.Lock()
 MODEL = "o4-mini-2025-04-16"
-# We clip to 20 000 chars (~8k tokens) as a safety guard; raise if you like.
-MAX_CHARS = 20_000
+# Model per routing tier; `MODEL` is the default (see "Model routing").
+MODEL_TIERS = {"fast": "gpt-4.1-mini", "quality": MODEL}
+# One model call sees at most this many transcript tokens; longer transcripts
+# are split into windows and merged (see "Long transcripts" below).
+MAX_INPUT_TOKENS = 6_000
+
+
+def _client():
+    global CLIENT
+    if CLIENT is None:
+        with _CLIENT_LOCK:
+            if CLIENT is None:
+                from openai import OpenAI
+
+                CLIENT = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return CLIENT
 
 
 SYSTEM_PROMPT = (
@@ -88,646 +410,3204 @@ SYSTEM_PROMPT = (
 )
 
 
-def _build_map_openai(text: str) -> MindMap:
-    """Call GPT and validate the returned JSON against `MindMap`."""
+UPDATE_PROMPT = (
+    "You are UPDATING an existing mind-map with the next part of the same "
+    "meeting.  The user message holds the CURRENT MAP followed by the NEW "
+    "TRANSCRIPT spoken since it was built.\n"
+    "• Keep ids of nodes that still apply unchanged (the UI tracks them).\n"
+    "• Add, merge, relabel or prune nodes so the whole graph reflects the "
+    "meeting so far and still obeys every rule above.\n"
+    "• Return the COMPLETE updated graph, not just the changes."
+)
 
-    start = time.perf_counter()
-    res = CLIENT.chat.completions.create(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": text[:MAX_CHARS]},
-        ],
-        response_format={"type": "json_object"}
-    )
-    elapsed_ms = round((time.perf_counter() - start) * 1000)
-    print(f"🕒  {elapsed_ms}ms", file=sys.stderr)
 
-    raw = res.choices[0].message.content  # JSON string from LLM
+# ───────────────────── Model routing ───────────────────────
+# A 50-char interim update and a 20 000-char final pass need different
+# models.  `_route` picks a tier per request: live meeting updates and small
+# one-off transcripts go to the fast tier, final passes and large
+# transcripts to the quality tier — unless its circuit is open or its
+# recent latency would not fit the request's deadline.  Until a tier has
+# enough calls behind it, TIER_PRIOR_S stands in for its observed latency.
+
+ROUTE_FAST_TOKENS = 1_500     # one-off transcripts this small use the fast tier
+ROUTE_PERCENTILE = 0.75       # the latency a tier is expected to hit
+ROUTE_HEADROOM = 0.8          # share of the deadline the quality tier may use
+ROUTE_PROBE_EVERY = 20        # 1 in N deadline demotions still tries quality
+TIER_PRIOR_S = {"fast": 4.0, "quality": 15.0}
+
+_TIER: ContextVar[str] = ContextVar("tier", default="quality")
+# A tier that is never called never shows it has recovered; probes fix that.
+_DEMOTIONS = itertools.count(1)
+
+
+def _tier_model() -> str:
+    return MODEL_TIERS[_TIER.get()]
+
+
+def _expected_latency(tier: str) -> float:
+    observed = _LATENCIES[tier].percentile(ROUTE_PERCENTILE)
+    return TIER_PRIOR_S[tier] if observed is None else observed
+
+
+def _route(text: str, meeting_id: str | None, final: bool, deadline_s: float) -> str:
+    """Pick the model tier for one request and record why."""
+    expected = {tier: _expected_latency(tier) for tier in MODEL_TIERS}
+    if final:
+        tier, reason = "quality", "final"
+    elif meeting_id:
+        tier, reason = "fast", "interim"
+    elif count_tokens(text) <= ROUTE_FAST_TOKENS:
+        tier, reason = "fast", "small"
+    else:
+        tier, reason = "quality", "large"
+    breaker = _BREAKERS.get("quality")
+    if tier == "quality" and breaker is not None and breaker.is_open():
+        tier, reason = "fast", "breaker"
+    elif tier == "quality" and expected["quality"] > deadline_s * ROUTE_HEADROOM:
+        if next(_DEMOTIONS) % ROUTE_PROBE_EVERY:
+            tier, reason = "fast", "deadline"
+        else:
+            reason = "probe"
+    METRICS.inc("mindmap_route_total", tier=tier, reason=reason)
+    for name, seconds in expected.items():
+        METRICS.set_gauge("mindmap_route_expected_seconds", round(seconds, 3), tier=name)
+    _log(f"🧭 {tier} tier ({reason})")
+    return tier
+
+
+# ───────────────────────── Rate limits ─────────────────────
+# The provider caps requests and tokens per minute, per model.  With
+# MINDMAP_RPM and/or MINDMAP_TPM set, every model call first waits for budget
+# in two token buckets, queued by priority class: live requests, then jobs,
+# then batch backfill, first come first served within a class.  Only the
+# head of the queue may take budget, so a large live call is not starved by
+# a stream of small batch ones.  A call's tokens are estimated up front (prompt + expected
+# completion) and settled against the usage the API reports; a 429 that
+# slips through pauses that model's queue.  Unset, calls go straight out.
+
+RATE_LIMIT_RPM = int(os.getenv("MINDMAP_RPM") or 0)
+RATE_LIMIT_TPM = int(os.getenv("MINDMAP_TPM") or 0)
+# Providers enforce limits over shorter windows than the minute too: a full
+# minute's budget sent in one burst is rejected.  Buckets hold this much.
+RATE_LIMIT_BURST_S = 6
+PRIORITIES = {"interactive": 0, "job": 1, "batch": 2}
+OUTPUT_TOKENS_PRIOR = 1_500   # expected completion (reasoning included) until usage is seen
+MESSAGE_OVERHEAD_TOKENS = 4   # chat framing per message
+RATE_LIMIT_PAUSE_S = 5        # after a 429 without Retry-After
+RATE_LIMIT_POLL_S = 0.25      # longest sleep of an async call waiting for budget
+
+_PRIORITY: ContextVar[str] = ContextVar("priority", default="interactive")
+
+
+class _TokenBucket:
+    """`per_minute` units, refilled continuously and holding `burst_s`
+    seconds' worth.  The level may go negative when a call turns out to cost
+    more than was estimated."""
+
+    def __init__(self, per_minute: int, burst_s: float = RATE_LIMIT_BURST_S):
+        self._rate = per_minute / 60
+        self.capacity = self._rate * burst_s
+        self.level = self.capacity
+        self._at = time.monotonic()
+
+    def wait(self, amount: float, now: float) -> float:
+        """Seconds until `amount` units are available (0: now)."""
+        self.level = min(self.capacity, self.level + (now - self._at) * self._rate)
+        self._at = now
+        # A call bigger than the whole bucket would never fit; it waits for a full one.
+        return max(0.0, (min(amount, self.capacity) - self.level) / self._rate)
+
+
+class _RateLimiter:
+    """Priority admission to one model's request and token buckets.
+
+    Tickets wait in a heap; only the head is woken when budget may have
+    freed up, so a long queue costs no thundering herd per admission."""
+
+    def __init__(self, model: str, rpm: int = 0, tpm: int = 0):
+        self.model = model
+        self._requests = _TokenBucket(rpm) if rpm else None
+        self._tokens = _TokenBucket(tpm) if tpm else None
+        self._queue: list = []            # heap of (rank, seq, Condition | None)
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._output = float(OUTPUT_TOKENS_PRIOR)  # running mean of completion tokens
+        self._lock = threading.Lock()
+
+    def estimate(self, messages: list) -> int:
+        prompt = sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+        return prompt + round(self._output)
+
+    def backlog(self) -> int:
+        return len(self._queue)
+
+    def _enqueue(self, priority: str, cond: "threading.Condition | None") -> tuple:
+        ticket = (PRIORITIES.get(priority, 0), next(self._seq), cond)
+        with self._lock:
+            heapq.heappush(self._queue, ticket)
+        METRICS.add_gauge("mindmap_ratelimit_queued", 1, model=self.model, priority=priority)
+        return ticket
+
+    def _wake_head(self) -> None:
+        """Holds `_lock`.  Async tickets have no condition: they poll."""
+        if self._queue and self._queue[0][2] is not None:
+            self._queue[0][2].notify()
+
+    def _try(self, ticket: tuple, tokens: int) -> float:
+        """Take the budget if `ticket` heads the queue and it is there;
+        returns 0 when admitted, else how long to wait.  Holds `_lock`."""
+        if self._queue[0] is not ticket:
+            return float("inf")  # woken when it becomes the head
+        now = time.monotonic()
+        wait = self._paused_until - now
+        if self._requests is not None:
+            wait = max(wait, self._requests.wait(1, now))
+        if self._tokens is not None:
+            wait = max(wait, self._tokens.wait(tokens, now))
+        if wait > 0:
+            return wait
+        if self._requests is not None:
+            self._requests.level -= 1
+        if self._tokens is not None:
+            self._tokens.level -= tokens
+        heapq.heappop(self._queue)
+        self._wake_head()  # the next in line may fit as well
+        return 0.0
+
+    def _drop(self, ticket: tuple) -> None:
+        """Leave the queue without budget.  Holds `_lock`."""
+        head = self._queue[0] is ticket
+        self._queue.remove(ticket)
+        heapq.heapify(self._queue)
+        if head:
+            self._wake_head()
+
+    def _done(self, priority: str, start: float, admitted: bool) -> None:
+        METRICS.add_gauge("mindmap_ratelimit_queued", -1, model=self.model, priority=priority)
+        METRICS.observe("mindmap_ratelimit_wait_seconds", time.monotonic() - start,
+                        priority=priority)
+        if not admitted:
+            METRICS.inc("mindmap_ratelimit_timeouts_total", model=self.model, priority=priority)
+            raise DeadlineExceeded(f"no {self.model} rate-limit budget before the deadline")
+
+    def acquire(self, tokens: int, priority: str, deadline: float) -> None:
+        """Block until admitted; DeadlineExceeded once `deadline` passes."""
+        start = time.monotonic()
+        cond = threading.Condition(self._lock)
+        ticket = self._enqueue(priority, cond)
+        with self._lock:
+            while wait := self._try(ticket, tokens):
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    self._drop(ticket)
+                    break
+                cond.wait(min(wait, left))
+        self._done(priority, start, not wait)
+
+    async def acquire_async(self, tokens: int, priority: str, deadline: float) -> None:
+        """`acquire` for the event loop: polls instead of blocking it."""
+        import asyncio
+
+        start = time.monotonic()
+        ticket = self._enqueue(priority, None)
+        while True:
+            with self._lock:
+                wait = self._try(ticket, tokens)
+                left = deadline - time.monotonic()
+                if wait and left <= 0:
+                    self._drop(ticket)
+            if not wait or left <= 0:
+                break
+            await asyncio.sleep(min(wait, left, RATE_LIMIT_POLL_S))
+        self._done(priority, start, not wait)
+
+    def settle(self, estimate: int, usage) -> None:
+        """Correct the token bucket by what the call really cost."""
+        if usage is None:
+            return
+        spent = (usage.prompt_tokens or 0) + (usage.completion_tokens or 0)
+        with self._lock:
+            self._output += ((usage.completion_tokens or 0) - self._output) * 0.1
+            if self._tokens is not None:
+                self._tokens.level += estimate - spent
+            self._wake_head()
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+_LIMITERS: "dict[str, _RateLimiter]" = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def _limiter(model: str) -> "_RateLimiter | None":
+    if not (RATE_LIMIT_RPM or RATE_LIMIT_TPM):
+        return None
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(model)
+        if limiter is None:
+            limiter = _LIMITERS[model] = _RateLimiter(model, RATE_LIMIT_RPM, RATE_LIMIT_TPM)
+    return limiter
+
+
+def _backlogged() -> bool:
+    """Calls are waiting for the current tier's budget (see `_hedged`)."""
+    limiter = _LIMITERS.get(_tier_model())
+    return limiter is not None and limiter.backlog() > 0
+
+
+def _throttled(limiter: _RateLimiter, err: Exception) -> None:
+    """Pause `limiter` if `err` is the provider's 429."""
+    if getattr(err, "status_code", None) != 429:
+        return
+    try:
+        seconds = float(err.response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        seconds = RATE_LIMIT_PAUSE_S
+    METRICS.inc("mindmap_ratelimit_429_total", model=limiter.model)
+    _log(f"🚦 {limiter.model} rate limited; pausing {seconds:g}s")
+    limiter.pause(seconds)
+
+
+@contextmanager
+def _rate_limit(model: str, messages: list, deadline: float):
+    """Wait for `model`'s budget, then run the block.  Yields `settle(res)`,
+    to be called with the response (or chunk) that carries the usage."""
+    limiter = _limiter(model)
+    if limiter is None:
+        yield lambda res: None
+        return
+    estimate = limiter.estimate(messages)
+    limiter.acquire(estimate, _PRIORITY.get(), deadline)
+    try:
+        yield lambda res: limiter.settle(estimate, getattr(res, "usage", None))
+    except Exception as err:
+        _throttled(limiter, err)
+        raise
+
+
+@asynccontextmanager
+async def _rate_limit_async(model: str, messages: list, deadline: float):
+    """Async `_rate_limit`."""
+    limiter = _limiter(model)
+    if limiter is None:
+        yield lambda res: None
+        return
+    estimate = limiter.estimate(messages)
+    await limiter.acquire_async(estimate, _PRIORITY.get(), deadline)
+    try:
+        yield lambda res: limiter.settle(estimate, getattr(res, "usage", None))
+    except Exception as err:
+        _throttled(limiter, err)
+        raise
+
+
+# ─────────────────── Transcript pre-processing ─────────────
+# Caption exports are about half noise: `00:00:03.040` lines, `[Music]`
+# markers and a line break every few words.  `normalize_transcript` strips
+# all of that before anything is hashed, budgeted or sent, keeping the
+# timestamps as per-segment metadata.  Budgets are counted in tokens —
+# exactly with `tiktoken` when it is installed, else ~4 chars per token.
+
+_TIMESTAMP = r"(?:\d+:)?\d{1,2}:\d{2}(?:[.,]\d+)?"
+# WebVTT cue timings may be followed by settings: `align:start position:0%`.
+_TIMESTAMP_LINE = re.compile(
+    rf"^\s*({_TIMESTAMP})(?:\s*-->\s*({_TIMESTAMP})(?:\s+[^\s:]+:\S+)*)?\s*$"
+)
+_VTT_BLOCK = re.compile(r"^(?:NOTE|STYLE|REGION)(?:\s|$)")  # after a blank line, to the next
+_NON_SPEECH = re.compile(r"\[[^\]\n]{1,40}\]|♪+|>>")
+_CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class _Segment:
+    start: Optional[float]  # seconds from the start of the recording
+    end: Optional[float]
+    text: str
+
+
+def _seconds(stamp: str) -> float:
+    total = 0.0
+    for part in stamp.replace(",", ".").split(":"):
+        total = total * 60 + float(part)
+    return total
+
+
+def normalize_transcript(text: str) -> "tuple[str, List[_Segment]]":
+    """Return (clean text, timed segments).
+
+    Timestamp lines start a new segment; the cue numbers or identifiers
+    before them, WebVTT header, NOTE, STYLE and REGION blocks, and markers like
+    `[Music]` are dropped, and the remaining fragments are re-joined with
+    single spaces.  Live transcripts without timestamps come
+    back as one untimed segment.
+    """
+    segments: List[_Segment] = []
+    current: List[str] = []
+    start = end = None
+
+    def flush():
+        words = " ".join(current).split()
+        if words:
+            segments.append(_Segment(start, end, " ".join(words)))
 
+    lines = text.splitlines()
+    vtt = bool(lines) and lines[0].lstrip("\ufeff").startswith("WEBVTT")
+    skipping = vtt  # the header runs to the first blank line
+    for number, line in enumerate(lines):
+        if skipping or (vtt and _VTT_BLOCK.match(line) and not lines[number - 1].strip()):
+            skipping = bool(line.strip())
+            continue
+        stamp = _TIMESTAMP_LINE.match(line)
+        if stamp:
+            flush()
+            current = []
+            start = _seconds(stamp.group(1))
+            end = _seconds(stamp.group(2)) if stamp.group(2) else None
+            if segments and segments[-1].end is None:
+                segments[-1].end = start
+            continue
+        following = lines[number + 1] if number + 1 < len(lines) else ""
+        if (vtt or line.strip().isdecimal()) and _TIMESTAMP_LINE.match(following):
+            continue  # SRT cue number or WebVTT cue identifier
+        current.append(_NON_SPEECH.sub(" ", line))
+    flush()
+    return " ".join(seg.text for seg in segments), segments
+
+
+def _clean(text: str) -> str:
+    with METRICS.stage("normalize"):
+        clean, _ = normalize_transcript(text)
+    if len(clean) < len(text) * 0.9:
+        _log(f"🧹 {len(text)} → {len(clean)} chars")
+    return clean
+
+
+_ENCODER = None  # tiktoken encoder once loaded; False when unavailable
+
+
+def count_tokens(text: str) -> int:
+    global _ENCODER
+    if _ENCODER is None:
+        try:
+            import tiktoken
+            try:
+                _ENCODER = tiktoken.encoding_for_model(MODEL)
+            except KeyError:
+                _ENCODER = tiktoken.get_encoding("o200k_base")
+        except ImportError:
+            _ENCODER = False
+    if _ENCODER:
+        return len(_ENCODER.encode(text, disallowed_special=()))
+    return -(-len(text) // _CHARS_PER_TOKEN)
+
+
+def _chars_for(text: str, tokens: int) -> int:
+    """How many chars of `text` make up roughly `tokens` tokens."""
+    total = count_tokens(text)
+    return len(text) if total <= tokens else int(len(text) * tokens / total)
+
+
+def _clip_tokens(text: str, budget: int = MAX_INPUT_TOKENS) -> str:
+    """Longest word-aligned prefix of `text` within about `budget` tokens."""
+    cut = _chars_for(text, budget)
+    if cut >= len(text):
+        return text
+    METRICS.inc("mindmap_truncations_total")
+    space = text.rfind(" ", 0, cut)
+    return text[:space if space > 0 else cut]
+
+
+def _parse_completion(raw: str) -> MindMap:
+    """Validate the model's JSON string against `MindMap`, salvaging and
+    repairing locally whatever can be fixed (see "Output repair")."""
     try:
-        mindmap = MindMap.model_validate_json(raw)
-        preview = mindmap.model_dump()
-        print(
-            f"✅ nodes={len(preview['nodes'])} edges={len(preview['edges'])} "
-            f"example-node={preview['nodes'][0]['id'] if preview['nodes'] else 'none'}",
-            file=sys.stderr,
+        with METRICS.stage("validate"):
+            try:
+                mindmap = MindMap.model_validate_json(raw)
+            except ValidationError:
+                METRICS.inc("mindmap_validation_failures_total")
+                mindmap = _salvage_map(raw)
+            mindmap = repair_map(mindmap)
+        _log(
+            f"✅ nodes={len(mindmap.nodes)} edges={len(mindmap.edges)} "
+            f"example-node={mindmap.nodes[0].id if mindmap.nodes else 'none'}"
         )
         return mindmap
-    except ValidationError as e:
+    except ValueError as e:  # ValidationError included
+        METRICS.inc("mindmap_unrepairable_total")
         raise RuntimeError(f"Invalid LLM JSON: {e}\n{raw}") from e
 
 
-# Public helper that honours the USE_SAMPLE flag
-def build_map(_: str | None = None) -> MindMap:
-    global _CACHED_SAMPLE_MAP
+def _complete(messages: list) -> MindMap:
+    """Call GPT and validate the returned JSON against `MindMap`."""
 
-    if not USE_SAMPLE:
-        # Fall back to live behaviour
-        return _build_map_openai(_ or "")
+    model = _tier_model()
 
-    # Sample mode
-    if _CACHED_SAMPLE_MAP is None:
-        print("⚡ Generating mind-map from hard-coded transcript …", file=sys.stderr)
-        _CACHED_SAMPLE_MAP = _build_map_openai(SAMPLE_TRANSCRIPT)
-    return _CACHED_SAMPLE_MAP
+    def call(timeout: float):
+        deadline = time.monotonic() + timeout
+        with _rate_limit(model, messages, deadline) as settle:
+            with METRICS.stage("llm"):
+                res = _client().chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    response_format={"type": "json_object"},
+                    timeout=max(deadline - time.monotonic(), 0.1),
+                )
+            settle(res)
+        return res
 
+    res = _hedged(call)
+    _record_usage(res)
 
-# ──────────────────── HTTP handler class ──────────────────
+    raw = res.choices[0].message.content  # JSON string from LLM
+    return _parse_completion(raw)
 
 
-class handler(BaseHTTPRequestHandler):
-    def _set_cors(self):
-        # Allow all origins for local development; tighten in prod if needed
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type")
-        self.send_header("Access-Control-Allow-Methods", "POST, OPTIONS")
+def _fresh_messages(text: str) -> list:
+    """Prompt for a map built from scratch for the (clipped) transcript."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": _clip_tokens(text)},
+    ]
 
-    def _json(self, code: int, obj):
-        payload = json.dumps(obj).encode()
-        self.send_response(code)
-        self._set_cors()
-        self.send_header("Content-Type", "application/json")
-        self.end_headers()
-        self.wfile.write(payload)
 
-    # Handle CORS pre-flight
-    def do_OPTIONS(self):
-        self.send_response(204)
-        self._set_cors()
-        self.end_headers()
+def _compact_map(mindmap: MindMap) -> str:
+    """Terse text form of a map: one `id|label|importance` line per node,
+    then one `source>target` line per edge.  Far cheaper than the JSON."""
+    nodes = [f"{n.id}|{n.label}|{n.importance or ''}" for n in mindmap.nodes]
+    edges = [f"{e.source}>{e.target}" for e in mindmap.edges]
+    return "\n".join(["NODES", *nodes, "EDGES", *edges])
 
-    def do_POST(self):
-        # 1️⃣  Grab body (could be 0-bytes)
-        length = int(self.headers.get("content-length", 0))
-        body = self.rfile.read(length).decode() if length else "{}"
-        data = json.loads(body or "{}")
-        text = (data.get("text") or "").strip()
 
-        # Empty transcript → just return an empty map; no exceptions.
-        if not text:
-            print("ℹ️  empty transcript", file=sys.stderr)
-            self._json(200, {"nodes": [], "edges": []})
-            return
+def _update_messages(previous: MindMap, delta: str) -> list:
+    """Prompt that folds `delta` (new transcript only) into `previous`."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "system", "content": UPDATE_PROMPT},
+        {
+            "role": "user",
+            "content": f"CURRENT MAP\n{_compact_map(previous)}\n\n"
+                       f"NEW TRANSCRIPT\n{delta}",
+        },
+    ]
 
-        # 2️⃣  Call GPT
-        try:
-            result = build_map(text)
-            self._json(200, result.model_dump())
-        except Exception as err:
-            print("❌  backend error:", err, file=sys.stderr)
-            self._json(500, {"error": "Mind-map generation failed"})
+
+# ─────────────────── Extractive pre-compression ─────────────
+# Optional (MINDMAP_COMPRESS=1, needs NumPy): before a transcript that is
+# over budget is map-reduced, shrink it locally by keeping its most central
+# sentences.  Sentences are scored by TF-IDF salience plus TextRank over
+# their cosine-similarity graph; the graph is never materialised — each
+# power-iteration step is two sparse mat-vecs done with `np.bincount`.
+
+COMPRESS_OVER_BUDGET = os.getenv("MINDMAP_COMPRESS") == "1"
+COMPRESS_MIN_RATIO = 0.3   # never keep less than this share of the text
+SENTENCE_WORDS = 20        # caption text has no punctuation: cut runs this long
+TEXTRANK_DAMPING = 0.85
+TEXTRANK_ITERATIONS = 30
+
+_STOPWORDS = frozenset(
+    "a about all also am an and any are as at be been but by can could did do "
+    "does don for from get go going gonna got had has have he her here him his "
+    "how i if in into is it its just know like me my no not now of oh ok okay on "
+    "one or our out really right so some that the their them then there these "
+    "they thing things think this those to um uh up us very vs was we well were "
+    "what when where which who will with would yeah you your".split()
+)
+_WORD = re.compile(r"[a-z0-9']+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _sentences(text: str) -> List[str]:
+    """Split on sentence punctuation, then cut long runs into
+    SENTENCE_WORDS-word pieces so unpunctuated captions still split."""
+    out = []
+    for sentence in _SENTENCE_END.split(text):
+        words = sentence.split()
+        for i in range(0, len(words), SENTENCE_WORDS):
+            out.append(" ".join(words[i:i + SENTENCE_WORDS]))
+    return out
+
+
+def _rank_sentences(sentences: List[str]):
+    """TF-IDF + TextRank score per sentence (NumPy array, higher = keep)."""
+    import numpy as np
+
+    vocab: dict = {}
+    rows, cols = [], []
+    for i, sentence in enumerate(sentences):
+        for word in _WORD.findall(sentence.lower()):
+            if word not in _STOPWORDS:
+                rows.append(i)
+                cols.append(vocab.setdefault(word, len(vocab)))
+    n = len(sentences)
+    if not rows:
+        return np.zeros(n)
+
+    # Sparse sentence × term matrix in COO form, duplicates summed.
+    pairs, counts = np.unique(
+        np.asarray(rows, dtype=np.int64) * len(vocab) + np.asarray(cols), return_counts=True
+    )
+    r, c = pairs // len(vocab), pairs % len(vocab)
+    df = np.bincount(c, minlength=len(vocab))
+    weights = counts * (np.log((1 + n) / (1 + df)) + 1.0)[c]
+    norms = np.sqrt(np.bincount(r, weights=weights ** 2, minlength=n))
+    salience = norms / np.maximum(np.bincount(r, weights=counts, minlength=n), 1)
+    weights = weights / norms[r]  # rows now unit length → X·Xᵀ is cosine
+
+    def similarity(v):  # (X·Xᵀ − I)·v without building the n × n matrix
+        xt_v = np.bincount(c, weights=weights * v[r], minlength=len(vocab))
+        return np.bincount(r, weights=weights * xt_v[c], minlength=n) - v * (norms > 0)
+
+    degree = np.maximum(similarity(np.ones(n)), 1e-9)
+    rank = np.full(n, 1.0 / n)
+    for _ in range(TEXTRANK_ITERATIONS):
+        rank = (1 - TEXTRANK_DAMPING) / n + TEXTRANK_DAMPING * similarity(rank / degree)
+
+    def unit(x):
+        return x / x.max() if x.max() > 0 else x
+
+    return unit(rank) + unit(salience)
+
+
+def compress_transcript(text: str, ratio: float) -> str:
+    """Keep the best-scoring sentences, in their original order, until about
+    `ratio` of the text's length is reached."""
+    sentences = _sentences(text)
+    if len(sentences) < 2:
+        return text
+    scores = _rank_sentences(sentences)
+    budget = int(len(text) * ratio)
+    keep, used = [], 0
+    for i in scores.argsort()[::-1]:
+        if used + len(sentences[i]) > budget:
+            continue
+        keep.append(i)
+        used += len(sentences[i]) + 1
+    return " ".join(sentences[i] for i in sorted(keep))
+
+
+def _fit_budget(text: str) -> str:
+    """Compress an over-budget transcript when enabled; map-reduce copes
+    with whatever is still too long."""
+    tokens = count_tokens(text)
+    if not COMPRESS_OVER_BUDGET or tokens <= MAX_INPUT_TOKENS:
+        return text
+    try:
+        compressed = compress_transcript(text, max(COMPRESS_MIN_RATIO, MAX_INPUT_TOKENS / tokens))
+    except ImportError:
+        _log("⚠️  MINDMAP_COMPRESS needs numpy; skipping compression")
+        return text
+    _log(f"🗜️  {tokens} → {count_tokens(compressed)} tokens")
+    return compressed
+
+
+# ──────────────────── Long transcripts ─────────────────────
+# Anything over MAX_INPUT_TOKENS is cut into overlapping windows that are mapped in
+# parallel; the partial maps are then merged locally into one map that still
+# follows SYSTEM_PROMPT's shape (root → ≤8 topics → ≤3 call-outs, ≤20 nodes).
+
+CHUNK_OVERLAP_TOKENS = 250
+CHUNK_WORKERS = 6
+MAX_NODES = 20
+MAX_TOPICS = 8
+MAX_CALLOUTS = 3
+
+
+def _split_windows(text: str, budget: int = MAX_INPUT_TOKENS,
+                   overlap: int = CHUNK_OVERLAP_TOKENS) -> List[str]:
+    """Split `text` into windows of about `budget` tokens that overlap by
+    about `overlap` tokens, preferring to cut at whitespace."""
+    size = max(1, _chars_for(text, budget))
+    overlap = _chars_for(text, overlap)
+    windows, start = [], 0
+    while True:
+        end = start + size
+        if end >= len(text):
+            windows.append(text[start:])
+            return windows
+        cut = text.rfind(" ", start + size // 2, end)
+        end = cut if cut > 0 else end
+        windows.append(text[start:end])
+        start = max(end - overlap, start + 1)
+        # Re-align the overlap to a word boundary as well.
+        space = text.find(" ", start, end)
+        start = space + 1 if space >= 0 else start
+
+
+def _label_key(label: str) -> str:
+    """Merge key: the label's significant words, order-insensitive."""
+    words = re.findall(r"[a-z0-9]+", label.lower())
+    return " ".join(sorted({w for w in words if w not in _STOPWORDS})) or label.lower()
+
+
+def _levels(mindmap: MindMap) -> "tuple[Node | None, List[Node], dict]":
+    """Return (root, topics, children-by-id) for a map shaped like
+    SYSTEM_PROMPT asks: the root is the most important node nothing points
+    to; topics are its children, call-outs theirs."""
+    by_id = {n.id: n for n in mindmap.nodes}
+    children: dict = {}
+    targets = set()
+    for e in mindmap.edges:
+        if e.source in by_id and e.target in by_id and e.source != e.target:
+            children.setdefault(e.source, []).append(by_id[e.target])
+            targets.add(e.target)
+    roots = [n for n in mindmap.nodes if n.id not in targets]
+    if not roots:
+        return None, [], children
+    root = max(roots, key=lambda n: n.importance or 0)
+    topics = list(children.get(root.id, []))
+    # Orphans that look like topics are hung under the root rather than lost.
+    topics += [n for n in roots if n is not root and (n.importance or 0) >= 3]
+    return root, topics, children
+
+
+def _merge_maps(maps: List[MindMap]) -> MindMap:
+    """Merge per-window maps: dedupe nodes by label, re-rank topics and
+    call-outs by how many windows mention them, and rebuild a DAG that
+    respects the node limits."""
+    root_labels: Counter = Counter()
+    root_ids: dict = {}   # label → id of the first root carrying it
+    topics: dict = {}     # key → {"node", "support", "first", "callouts"}
+    for index, mindmap in enumerate(maps):
+        root, level1, children = _levels(mindmap)
+        if root is None:
+            continue
+        root_labels[root.label] += 1
+        root_ids.setdefault(root.label, root.id)
+        for topic in level1:
+            entry = topics.setdefault(_label_key(topic.label), {
+                "node": topic, "support": 0, "first": index, "callouts": {},
+            })
+            entry["support"] += 1
+            for callout in children.get(topic.id, []):
+                c = entry["callouts"].setdefault(_label_key(callout.label), [callout, 0, index])
+                c[1] += 1
+
+    if not root_labels:
+        return MindMap(nodes=[], edges=[])
+
+    # Most-supported topics win; earlier windows break ties.
+    ranked = sorted(topics.values(), key=lambda t: (-t["support"], t["first"]))[:MAX_TOPICS]
+    ranked.sort(key=lambda t: t["first"])  # back to meeting order
+
+    root_label = root_labels.most_common(1)[0][0]
+    seen_ids: set = set()
+
+    def unique(node_id: str) -> str:
+        candidate, n = node_id, 2
+        while candidate in seen_ids:
+            candidate, n = f"{node_id}-{n}", n + 1
+        seen_ids.add(candidate)
+        return candidate
+
+    root_id = unique(root_ids[root_label])
+    nodes = [Node(id=root_id, label=root_label, importance=5)]
+    edges: List[Edge] = []
+    budget = MAX_NODES - 1 - len(ranked)
+    topic_ids = []
+    for t in ranked:
+        topic_id = unique(t["node"].id)
+        topic_ids.append(topic_id)
+        nodes.append(Node(id=topic_id, label=t["node"].label, importance=3))
+        edges.append(Edge(source=root_id, target=topic_id, relation="includes", weight=3))
+    for t, topic_id in zip(ranked, topic_ids):
+        callouts = sorted(t["callouts"].values(), key=lambda c: (-c[1], c[2]))
+        for callout, _support, _first in callouts[:max(0, min(MAX_CALLOUTS, budget))]:
+            callout_id = unique(callout.id)
+            nodes.append(Node(id=callout_id, label=callout.label, importance=1))
+            edges.append(Edge(source=topic_id, target=callout_id, relation="includes", weight=1))
+            budget -= 1
+    return MindMap(nodes=nodes, edges=edges)
+
+
+def _build_map_openai(text: str) -> MindMap:
+    """Build a map from scratch, map-reducing transcripts over budget."""
+    text = _fit_budget(text)
+    if count_tokens(text) <= MAX_INPUT_TOKENS:
+        return _complete(_fresh_messages(text))
+    windows = _split_windows(text)
+    _log(f"🧩 {count_tokens(text)} tokens → {len(windows)} windows")
+    # Pool threads start with an empty context: hand each window a copy of
+    # ours so it keeps the trace id and deadline.
+    contexts = [copy_context() for _ in windows]
+    with ThreadPoolExecutor(max_workers=min(CHUNK_WORKERS, len(windows))) as pool:
+        partials = list(pool.map(
+            lambda ctx, window: ctx.run(_complete, _fresh_messages(window)), contexts, windows
+        ))
+    return _merge_maps(partials)
+
+
+# ─────────────────────── Output repair ─────────────────────
+# A map that breaks SYSTEM_PROMPT's rules is fixed here rather than paid for
+# again: `_salvage_map` reads JSON that is fenced, chatty, truncated or has
+# loosely typed fields, and `repair_map` makes any map well-formed — unique
+# ids, no dangling or duplicate edges, no cycles, at most MAX_NODES nodes,
+# importances filled in and edge weights equal to their target's.
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+def _close_json(text: str) -> str:
+    """`text` from its first "{" up to the end of that object; if it was cut
+    off, up to its last complete container, with the open ones closed."""
+    start = text.find("{")
+    if start < 0:
+        raise ValueError("no JSON object in completion")
+    closers: List[str] = []
+    cut = None
+    in_string = escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            closers.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if not closers or closers.pop() != ch:
+                break
+            if not closers:
+                return text[start:i + 1]
+            cut = (i + 1, "".join(reversed(closers)))
+    if cut is None:
+        raise ValueError("truncated before the first complete node")
+    return text[start:cut[0]] + cut[1]
+
+
+def _level(value) -> "int | None":
+    """An importance / weight as an int in 1..5, or None if unusable."""
+    if isinstance(value, bool):
+        return None
+    try:
+        return min(5, max(1, int(float(value))))
+    except (TypeError, ValueError):
+        return None
+
+
+def _salvage_map(raw: str) -> MindMap:
+    """Lenient fallback for output that failed strict validation."""
+    data = json.loads(_TRAILING_COMMA.sub(r"\1", _close_json(raw)))
+    if not isinstance(data, dict):
+        raise ValueError("completion is not a JSON object")
+
+    def text(value) -> str:
+        return str(value).strip() if isinstance(value, (str, int, float)) else ""
+
+    def items(key: str) -> list:
+        value = data.get(key)
+        return value if isinstance(value, list) else []
+
+    nodes, edges = [], []
+    for item in items("nodes"):
+        if isinstance(item, dict) and text(item.get("id")):
+            node_id = text(item["id"])
+            nodes.append(Node(id=node_id, label=text(item.get("label")) or node_id,
+                              importance=_level(item.get("importance"))))
+    for item in items("edges"):
+        if isinstance(item, dict):
+            source = text(item.get("source", item.get("from")))
+            target = text(item.get("target", item.get("to")))
+            if source and target:
+                relation = item.get("relation")
+                edges.append(Edge(source=source, target=target,
+                                  relation=relation if isinstance(relation, str) else None,
+                                  weight=_level(item.get("weight"))))
+    METRICS.inc("mindmap_repairs_total", kind="salvaged_json")
+    _log("🩹 salvaged malformed JSON")
+    return MindMap(nodes=nodes, edges=edges)
+
+
+def repair_map(mindmap: MindMap) -> MindMap:
+    """Return `mindmap` made well-formed (the same object if it already
+    was).  Linear in nodes + edges apart from sorting for MAX_NODES."""
+    fixes: Counter = Counter()
+    nodes: dict = {}
+    for node in mindmap.nodes:
+        kept = nodes.get(node.id)
+        if kept is None:
+            nodes[node.id] = node.model_copy()
+            continue
+        fixes["duplicate_id"] += 1  # first wins, at the higher importance
+        if (node.importance or 0) > (kept.importance or 0):
+            kept.importance = node.importance
+
+    children: dict = {node_id: [] for node_id in nodes}
+    given: dict = {}
+    for edge in mindmap.edges:
+        key = (edge.source, edge.target)
+        if edge.source not in nodes or edge.target not in nodes:
+            fixes["dangling_edge"] += 1
+        elif edge.source == edge.target:
+            fixes["cycle"] += 1
+        elif key in given:
+            fixes["duplicate_edge"] += 1
+        else:
+            given[key] = edge
+            children[edge.source].append(edge.target)
+
+    # Break cycles: iterative DFS from the roots, most important first,
+    # dropping every edge back into the current path.
+    has_parent = {target for _, target in given}
+    order = sorted(nodes, key=lambda i: (i in has_parent, -(nodes[i].importance or 0)))
+    state = dict.fromkeys(nodes, 0)  # 0 unseen, 1 on the path, 2 finished
+    kept_edges = []
+    for start in order:
+        if state[start]:
+            continue
+        state[start] = 1
+        path = [(start, iter(children[start]))]
+        while path:
+            node_id, pending = path[-1]
+            for child in pending:
+                if state[child] == 1:
+                    fixes["cycle"] += 1
+                    continue
+                kept_edges.append((node_id, child))
+                if state[child] == 0:
+                    state[child] = 1
+                    path.append((child, iter(children[child])))
+                    break
+            else:
+                state[node_id] = 2
+                path.pop()
+
+    # Missing importances follow the depth: root 5, topics 3, call-outs 1.
+    if any(n.importance is None for n in nodes.values()):
+        child_ids: dict = {}
+        for source, target in kept_edges:
+            child_ids.setdefault(source, []).append(target)
+        targets = {target for _, target in kept_edges}
+        depth = {i: 0 for i in nodes if i not in targets}
+        queue = deque(depth)
+        while queue:
+            node_id = queue.popleft()
+            for child in child_ids.get(node_id, []):
+                if child not in depth:
+                    depth[child] = depth[node_id] + 1
+                    queue.append(child)
+        for node_id, node in nodes.items():
+            if node.importance is None:
+                node.importance = {0: 5, 1: 3}.get(depth.get(node_id), 1)
+                fixes["importance"] += 1
+
+    if len(nodes) > MAX_NODES:
+        position = {node_id: i for i, node_id in enumerate(nodes)}
+        keep = set(sorted(nodes, key=lambda i: (-nodes[i].importance, position[i]))[:MAX_NODES])
+        fixes["over_limit"] += len(nodes) - MAX_NODES
+        nodes = {i: n for i, n in nodes.items() if i in keep}
+        kept_edges = [(s, t) for s, t in kept_edges if s in keep and t in keep]
+
+    edges = []
+    kept = set(kept_edges)
+    for key in (key for key in given if key in kept):  # original order
+        edge, weight = given[key], nodes[key[1]].importance
+        if edge.weight != weight or not edge.relation:
+            fixes["edge_fields"] += 1
+        edges.append(Edge(source=key[0], target=key[1],
+                          relation=edge.relation or "includes", weight=weight))
+
+    if not fixes:
+        return mindmap
+    for kind, count in fixes.items():
+        METRICS.inc("mindmap_repairs_total", count, kind=kind)
+    _log("🩹 repaired " + ", ".join(f"{kind}×{count}" for kind, count in fixes.items()))
+    return MindMap(nodes=list(nodes.values()), edges=edges)
+
+
+# ──────────────────── Local heuristic engine ───────────────
+# `build_map_local` builds a map without any model call, in milliseconds:
+# keyphrases are runs of content words scored by frequency, clustered into
+# topics by how often they occur in the same stretch of talk, and sentences
+# with decision / action / risk cues become call-outs.  It paints the first
+# poll of a meeting while the LLM works (see `build_map`) and stands in for
+# the LLM when it fails and there is no earlier map to serve.
+
+LOCAL_FALLBACK = os.getenv("MINDMAP_LOCAL_FALLBACK", "1") != "0"
+SPECULATIVE_WAIT_S = 0.5   # a meeting's first poll waits this long for the LLM
+LOCAL_PHRASE_WORDS = 3     # longest keyphrase
+LOCAL_CANDIDATES = 40      # keyphrases considered for topics
+LOCAL_LINK = 0.2           # sentence co-occurrence (Jaccard) that joins a topic
+
+# Conversational words and the cue words themselves never make a keyphrase.
+_FILLER = _STOPWORDS | frozenset(
+    "actually agree agreed another back because best better big bit decide "
+    "decided different down each else even every everyone everybody first "
+    "good great guys hey hello important kind last little lot make many maybe "
+    "mean more most much need needs next nothing other over pretty probably "
+    "quite really right said same say see should something sort still stuff "
+    "sure talk thank thanks thing things think time today try until very "
+    "want way week well will yeah yes approve approved settled follow assign "
+    "assigned deadline risk risks concern concerns issue issues problem "
+    "problems blocked blocker blockers delay delays worried".split()
+)
+_CUE = re.compile(
+    r"\b(?:(?P<decision>decided|decide|agreed|agree|approved?|settled|go with)"
+    r"|(?P<action>will|need to|needs to|going to|follow up|action item|assign\w*|deadline|by (?:monday|tuesday|wednesday|thursday|friday|next week))"
+    r"|(?P<risk>risks?|concerns?|blocked|blockers?|issues?|problems?|worried|delays?))\b",
+    re.IGNORECASE,
+)
+
+# Set when the answer came from the local engine: "speculative" (the LLM
+# is still working) or "fallback" (it failed).  The handler flags it.
+_LOCAL: ContextVar[str] = ContextVar("local", default="")
+
+
+def _keyphrases(sentences: List[str]) -> "tuple[Counter, dict]":
+    """Return (score per phrase, sentence indices per phrase)."""
+    where: dict = {}
+    words: Counter = Counter()
+    for i, sentence in enumerate(sentences):
+        run: List[str] = []
+        for word in _WORD.findall(sentence.lower()) + [""]:
+            if len(word) > 2 and word not in _FILLER and "'" not in word and not word.isdigit():
+                run.append(word)
+                continue
+            for j in range(0, len(run), LOCAL_PHRASE_WORDS):
+                phrase = tuple(run[j:j + LOCAL_PHRASE_WORDS])
+                where.setdefault(phrase, []).append(i)
+                words.update(phrase)
+            run = []
+    # Frequent words make strong phrases; repeated phrases stronger still.
+    scores = Counter({p: sum(words[w] for w in p) * len(seen) for p, seen in where.items()})
+    return scores, where
+
+
+def _title(phrase: tuple) -> str:
+    return " ".join(word.capitalize() for word in phrase)
+
+
+def build_map_local(text: str) -> MindMap:
+    """Heuristic map with SYSTEM_PROMPT's shape: a root, up to MAX_TOPICS
+    topics and up to MAX_CALLOUTS call-outs each, ≤ MAX_NODES in total."""
+    sentences = _sentences(text)
+    scores, where = _keyphrases(sentences)
+    if not scores:
+        return MindMap(nodes=[], edges=[])
+
+    # Greedy co-occurrence clustering: a candidate joins the topic it shares
+    # a word or the most sentences with, or starts a new topic if there is room.
+    topics: List[dict] = []
+    for phrase, _score in scores.most_common(LOCAL_CANDIDATES):
+        found = set(where[phrase])
+        best, overlap = None, 0.0
+        for topic in topics:
+            if set(phrase) & set(topic["head"]):
+                best, overlap = topic, 1.0
+                break
+            jaccard = len(found & topic["sentences"]) / len(found | topic["sentences"])
+            if jaccard > overlap:
+                best, overlap = topic, jaccard
+        if best is not None and overlap >= LOCAL_LINK:
+            best["sentences"] |= found
+        elif len(topics) < MAX_TOPICS:
+            topics.append({"head": phrase, "sentences": found})
+    topics.sort(key=lambda t: min(t["sentences"]))  # meeting order
+
+    seen_ids: set = set()
+
+    def unique(node_id: str) -> str:
+        candidate, n = node_id, 2
+        while candidate in seen_ids:
+            candidate, n = f"{node_id}-{n}", n + 1
+        seen_ids.add(candidate)
+        return candidate
+
+    title = scores.most_common(1)[0][0]
+    root_id = unique("meeting")
+    nodes = [Node(id=root_id, label=f"{_title(title[:2])} Meeting", importance=5)]
+    edges: List[Edge] = []
+    topic_ids = []
+    for topic in topics:
+        topic_id = unique("-".join(topic["head"]))
+        topic_ids.append(topic_id)
+        nodes.append(Node(id=topic_id, label=_title(topic["head"]), importance=3))
+        edges.append(Edge(source=root_id, target=topic_id, relation="includes", weight=3))
+
+    budget = MAX_NODES - len(nodes)
+    used: set = set()
+    for topic, topic_id in zip(topics, topic_ids):
+        picked = 0
+        named: set = set()  # subjects of this topic's call-outs so far
+        for i in sorted(topic["sentences"]):
+            cue = _CUE.search(sentences[i])
+            if budget <= 0 or picked >= MAX_CALLOUTS:
+                break
+            if cue is None or i in used:
+                continue
+            # Name the call-out after the sentence's best keyphrase, preferring
+            # one that does not just repeat the topic or a sibling call-out.
+            here = [p for p in where if i in where[p] and p != topic["head"] and p not in named]
+            if not here:
+                continue
+            subject = max(here, key=lambda p: (not set(p) & set(topic["head"]), scores[p]))
+            callout_id = unique(f"{cue.lastgroup}-{'-'.join(subject)}")
+            label = f"{cue.lastgroup.capitalize()}: {_title(subject)}"
+            nodes.append(Node(id=callout_id, label=label, importance=1))
+            edges.append(Edge(source=topic_id, target=callout_id, relation="includes", weight=1))
+            used.add(i)
+            named.add(subject)
+            picked += 1
+            budget -= 1
+    return MindMap(nodes=nodes, edges=edges)
+
+
+def _serve_local(text: str, kind: str) -> MindMap:
+    METRICS.inc("mindmap_local_served_total", kind=kind)
+    _log(f"🪴 local {kind} map")
+    _LOCAL.set(kind)
+    with METRICS.stage("local"):
+        return build_map_local(text)
+
+
+# ───────────────────── Meeting sessions ────────────────────
+# The live UI re-sends the whole, ever-growing transcript on every poll.
+# When it also sends a `meeting_id` we keep the last map plus how much of the
+# transcript that map already covers, and only show the model the new tail.
+
+SESSION_TTL_S = 2 * 60 * 60
+MAX_SESSIONS = 256
+# Fewer new chars than this → the previous map is returned as-is.
+MIN_DELTA_CHARS = 40
+
+
+@dataclass
+class _Session:
+    mindmap: MindMap
+    offset: int    # chars of transcript already folded into `mindmap`
+    digest: str    # sha1 of transcript[:offset]; spots a reset client
+    touched: float
+
+
+_SESSIONS: "OrderedDict[str, _Session]" = OrderedDict()
+_SESSIONS_LOCK = threading.Lock()
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def _get_session(meeting_id: str) -> "_Session | None":
+    with _SESSIONS_LOCK:
+        now = time.monotonic()
+        # Drop idle meetings (oldest first) so memory stays bounded.
+        while _SESSIONS:
+            oldest_id, oldest = next(iter(_SESSIONS.items()))
+            if now - oldest.touched < SESSION_TTL_S and len(_SESSIONS) <= MAX_SESSIONS:
+                break
+            del _SESSIONS[oldest_id]
+        return _SESSIONS.get(meeting_id)
+
+
+def _put_session(meeting_id: str, session: _Session) -> None:
+    with _SESSIONS_LOCK:
+        _SESSIONS[meeting_id] = session
+        _SESSIONS.move_to_end(meeting_id)
+
+
+def _plan_session(text: str, meeting_id: str) -> "tuple[MindMap | None, list, int]":
+    """Work out the next step for a meeting.
+
+    Returns `(ready, messages, offset)`: `ready` is set when the previous map
+    still covers the transcript; otherwise `messages` is the update prompt to
+    send (empty → build from scratch) and `offset` how much of `text` the
+    resulting map will cover.
+    """
+    session = _get_session(meeting_id)
+    if session and session.offset <= len(text) and _digest(text[:session.offset]) == session.digest:
+        delta = text[session.offset:]
+        if len(delta.strip()) < MIN_DELTA_CHARS:
+            session.touched = time.monotonic()
+            return session.mindmap, [], session.offset
+        delta = _clip_tokens(delta)
+        _log(f"➕ {meeting_id}: +{len(delta)} chars")
+        return None, _update_messages(session.mindmap, delta), session.offset + len(delta)
+
+    # First call for this meeting, or the client started over: a full build.
+    return None, [], len(text)
+
+
+def _finish_session(meeting_id: str, text: str, offset: int, mindmap: MindMap) -> None:
+    _put_session(meeting_id, _Session(mindmap, offset, _digest(text[:offset]), time.monotonic()))
+
+
+def _build_map_session(text: str, meeting_id: str) -> MindMap:
+    """Incremental build: only the transcript after the session offset is
+    sent, together with a compact dump of the map built so far."""
+    ready, messages, offset = _plan_session(text, meeting_id)
+    if ready is not None:
+        return ready
+    mindmap = _complete(messages) if messages else _build_map_openai(text)
+    _finish_session(meeting_id, text, offset, mindmap)
+    return mindmap
+
+
+# ───────────────────── Result cache ────────────────────────
+# Reloads, retries and duplicate tabs re-submit transcripts we have already
+# mapped.  Validated maps are cached under a hash of everything that shapes
+# the answer: an in-memory LRU in front of an optional SQLite file that
+# survives restarts (set MINDMAP_CACHE_DB to enable it).
+
+CACHE_MAX_ENTRIES = 512
+CACHE_TTL_S = 60 * 60
+CACHE_DB_PATH = os.getenv("MINDMAP_CACHE_DB")
+CACHE_DB_TTL_S = 7 * 24 * 60 * 60
+
+
+def _cache_key(text: str) -> str:
+    normalized = " ".join(text.split())
+    h = hashlib.sha256()
+    for part in (_tier_model(), SYSTEM_PROMPT, normalized):
+        h.update(part.encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class _ResultCache:
+    """LRU + TTL map cache with an optional SQLite tier."""
+
+    def __init__(self, max_entries: int, ttl_s: float,
+                 db_path: str | None = None, db_ttl_s: float = CACHE_DB_TTL_S):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.db_ttl_s = db_ttl_s
+        self._entries: "OrderedDict[str, tuple[float, MindMap]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS mindmaps "
+                "(key TEXT PRIMARY KEY, created REAL NOT NULL, json TEXT NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> "tuple[MindMap, str] | None":
+        """(map, "hit" or "disk_hit" for the tier that had it), else None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[0] < self.ttl_s:
+                self._entries.move_to_end(key)
+                return entry[1], "hit"
+            if entry:
+                del self._entries[key]
+            row = None
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT created, json FROM mindmaps WHERE key = ?", (key,)
+                ).fetchone()
+            if row and now - row[0] < self.db_ttl_s:
+                mindmap = MindMap.model_validate_json(row[1])
+                self._remember(key, mindmap, now)
+                return mindmap, "disk_hit"
+            return None
+
+    def put(self, key: str, mindmap: MindMap) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, mindmap, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO mindmaps VALUES (?, ?, ?)",
+                    (key, now, mindmap.model_dump_json()),
+                )
+                self._db.execute(
+                    "DELETE FROM mindmaps WHERE created < ?", (now - self.db_ttl_s,)
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, mindmap: MindMap, now: float) -> None:
+        self._entries[key] = (now, mindmap)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+_CACHE = _ResultCache(CACHE_MAX_ENTRIES, CACHE_TTL_S, CACHE_DB_PATH)
+
+
+def _cache_lookup(text: str, meeting_id: str | None) -> "MindMap | None":
+    offset = len(text)
+    with METRICS.stage("cache"):
+        cached, result = _CACHE.get(_cache_key(text)) or (None, "miss")
+        if cached is None and NEAR_DUP:
+            near = _NEAR.get(text)
+            if near is not None:
+                cached, length = near
+                offset = min(offset, length)
+                result = "near_hit"
+    METRICS.inc("mindmap_cache_lookups_total", result=result)
+    if cached is not None:
+        _log(f"💾 cache {result.replace('_', ' ')}")
+        if meeting_id:
+            # Keep the session in step so the next poll is a small delta
+            # (after a near hit, one that includes what the entry lacked).
+            _finish_session(meeting_id, text, offset, cached)
+    return cached
+
+
+def _cache_store(text: str, mindmap: MindMap) -> None:
+    _CACHE.put(_cache_key(text), mindmap)
+    if NEAR_DUP:
+        _NEAR.put(text, mindmap)
+
+
+# ────────────────── Near-duplicate cache ───────────────────
+# Consecutive polls differ by a sentence or two, so exact hashing misses.
+# Each cached transcript also gets a MinHash signature of its word
+# shingles, indexed by LSH bands; a lookup that shares a band with an entry
+# for the same model, is estimated at NEAR_DUP_THRESHOLD similarity or
+# more and differs in size by at most NEAR_DUP_MAX_DELTA reuses that map.
+# Signatures use NumPy when it is installed and plain Python otherwise.
+
+NEAR_DUP = os.getenv("MINDMAP_NEAR_DUP", "1") != "0"
+NEAR_DUP_THRESHOLD = 0.9      # estimated Jaccard similarity of shingle sets
+NEAR_DUP_MAX_DELTA = 0.05     # relative length difference
+NEAR_DUP_ENTRIES = 1024
+SHINGLE_WORDS = 5
+LSH_BANDS, LSH_ROWS = 8, 8    # 64 hashes; pairs at 0.9 collide ~99% of the time
+_PRIME = (1 << 32) + 15       # a*h + b stays below 2**64 for 32-bit a, b, h
+SIGNATURE_BLOCK = 4096        # shingles hashed at once: 2 MiB per 64×block array
+
+
+def _minhash_params():
+    import random
+
+    rng = random.Random(0x6D6D)
+    count = LSH_BANDS * LSH_ROWS
+    return ([rng.randrange(1, 1 << 32) for _ in range(count)],
+            [rng.randrange(0, 1 << 32) for _ in range(count)])
+
+
+_MINHASH_A, _MINHASH_B = _minhash_params()
+
+
+def _shingles(text: str) -> set:
+    words = _WORD.findall(text.lower())
+    return {hash(tuple(words[i:i + SHINGLE_WORDS])) & 0xFFFFFFFF
+            for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def _signature(shingles: set) -> tuple:
+    try:
+        import numpy as np
+    except ImportError:
+        return tuple(min((a * h + b) % _PRIME for h in shingles)
+                     for a, b in zip(_MINHASH_A, _MINHASH_B))
+    a = np.asarray(_MINHASH_A, dtype=np.uint64)[:, None]
+    b = np.asarray(_MINHASH_B, dtype=np.uint64)[:, None]
+    signature = np.full(len(_MINHASH_A), np.iinfo(np.uint64).max, dtype=np.uint64)
+    # A block at a time: the 64×N products would otherwise cost 0.5 KiB
+    # per shingle (over 1 GiB at the request size limit).
+    shingles = iter(shingles)
+    while True:
+        h = np.fromiter(itertools.islice(shingles, SIGNATURE_BLOCK), dtype=np.uint64)
+        if not h.size:
+            return tuple(signature.tolist())
+        np.minimum(signature, ((a * h + b) % np.uint64(_PRIME)).min(axis=1), out=signature)
+
+
+class _NearDuplicateIndex:
+    """Bounded LRU of (signature, length, model, map) with an LSH band table."""
+
+    def __init__(self, max_entries: int = NEAR_DUP_ENTRIES, ttl_s: float = CACHE_TTL_S):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._bands: "dict[tuple, set]" = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _band_keys(signature: tuple) -> List[tuple]:
+        return [(band, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS])
+                for band in range(LSH_BANDS)]
+
+    def put(self, text: str, mindmap: MindMap) -> None:
+        shingles = _shingles(text)
+        if not shingles:
+            return
+        signature = _signature(shingles)
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = (signature, len(text), _tier_model(), mindmap, time.time())
+            for key in self._band_keys(signature):
+                self._bands.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+            METRICS.set_gauge("mindmap_near_dup_entries", len(self._entries))
+
+    def get(self, text: str) -> "tuple[MindMap, int] | None":
+        """(map, length of the transcript it was built from) of the most
+        similar qualifying entry, else None."""
+        shingles = _shingles(text)
+        if not shingles:
+            return None
+        signature = _signature(shingles)
+        model, now = _tier_model(), time.time()
+        best, best_score = None, NEAR_DUP_THRESHOLD
+        with self._lock:
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates |= self._bands.get(key, set())
+            for entry_id in candidates:
+                other, length, entry_model, _map, created = self._entries[entry_id]
+                if now - created >= self.ttl_s:
+                    self._drop(entry_id)
+                    continue
+                if (entry_model != model
+                        or abs(length - len(text)) > NEAR_DUP_MAX_DELTA * max(length, len(text))):
+                    continue
+                score = sum(x == y for x, y in zip(signature, other)) / len(signature)
+                if score >= best_score:
+                    best, best_score = entry_id, score
+            if best is None:
+                return None
+            self._entries.move_to_end(best)
+            _, length, _, mindmap, _ = self._entries[best]
+        return mindmap, length
+
+    def _drop(self, entry_id: int) -> None:
+        signature = self._entries.pop(entry_id)[0]
+        for key in self._band_keys(signature):
+            ids = self._bands.get(key)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._bands[key]
+
+
+_NEAR = _NearDuplicateIndex()
+
+
+# ──────────────────── Request coalescing ───────────────────
+# The 15 s pump plus slow generations means several requests for the same
+# meeting overlap.  Identical requests share one upstream call (single
+# flight), and per meeting only the newest transcript is generated: calls
+# run one at a time, and any request that is overtaken while it waits skips
+# its own call and answers with the newer map instead.
+
+
+class _Flight:
+    """One upstream generation that any number of requests may wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: "MindMap | None" = None
+        self.error: "BaseException | None" = None
+        self.superseded_by: "_Flight | None" = None
+
+    def wait(self) -> MindMap:
+        flight = self
+        flight.done.wait()
+        while flight.superseded_by is not None:
+            flight = flight.superseded_by
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+
+class _Gate:
+    """Per-meeting serialisation plus a pointer to the newest flight."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latest: "_Flight | None" = None
+        self.users = 0
+
+
+_FLIGHTS: "dict[str, _Flight]" = {}
+_GATES: "dict[str, _Gate]" = {}
+_FLIGHTS_LOCK = threading.Lock()
+
+
+def _single_flight(text: str, meeting_id: str | None, generate) -> MindMap:
+    """Run `generate()` unless an identical request is already running, or a
+    newer transcript for the same meeting overtakes this one first."""
+    key = f"{meeting_id or ''}:{_cache_key(text)}"
+    gate = None
+    with _FLIGHTS_LOCK:
+        joined = _FLIGHTS.get(key)
+        if joined is None:
+            flight = _FLIGHTS[key] = _Flight()
+            if meeting_id:
+                gate = _GATES.setdefault(meeting_id, _Gate())
+                gate.latest = flight
+                gate.users += 1
+    if joined is not None:
+        METRICS.inc("mindmap_coalesced_total", reason="joined")
+        _log("🔗 joined in-flight request")
+        return joined.wait()
+
+    try:
+        if gate is None:
+            flight.result = generate()
+        else:
+            with gate.lock:
+                if gate.latest is flight:
+                    flight.result = generate()
+                else:
+                    METRICS.inc("mindmap_coalesced_total", reason="superseded")
+                    _log(f"⏭️  {meeting_id}: superseded before it started")
+                    flight.superseded_by = gate.latest
+    except BaseException as err:
+        flight.error = err
+    finally:
+        with _FLIGHTS_LOCK:
+            del _FLIGHTS[key]
+            if gate is not None:
+                gate.users -= 1
+                if gate.users == 0:
+                    del _GATES[meeting_id]
+        flight.done.set()
+    return flight.wait()
+
+
+def _generate(text: str, meeting_id: str | None, final: bool = False) -> MindMap:
+    if meeting_id and not final:
+        mindmap = _build_map_session(text, meeting_id)
+    else:
+        # The final pass rebuilds from the whole transcript on its tier
+        # rather than patching a map the fast tier has been growing.
+        mindmap = _build_map_openai(text)
+        if meeting_id:
+            _finish_session(meeting_id, text, len(text), mindmap)
+    _cache_store(text, mindmap)
+    return mindmap
+
+
+_GENERATIONS = ThreadPoolExecutor(max_workers=LLM_POOL_WORKERS, thread_name_prefix="gen")
+
+
+def _build_within_deadline(text: str, meeting_id: str | None, deadline_s: float,
+                           final: bool = False) -> MindMap:
+    """Generate in the background and wait at most `deadline_s`.
+
+    A meeting whose generation is late or failing gets its last good map
+    instead (flagged through `_STALE`); a late generation keeps running and
+    refreshes the session and cache when it lands, so the next poll is
+    served the fresh map — stale-while-revalidate.  The generation gets at
+    least GENERATION_DEADLINE_S for that, however short `deadline_s` is.
+    Without a last good map the local engine answers (flagged through
+    `_LOCAL`): after only SPECULATIVE_WAIT_S on a meeting's first poll, or
+    when generation fails."""
+    ctx = copy_context()
+    ctx.run(_DEADLINE.set, time.monotonic() + max(deadline_s, GENERATION_DEADLINE_S))
+    future = _GENERATIONS.submit(
+        ctx.run, _single_flight, text, meeting_id, lambda: _generate(text, meeting_id, final)
+    )
+    session = _get_session(meeting_id) if meeting_id else None
+    speculative = session is None and meeting_id is not None and not final
+    try:
+        return future.result(timeout=min(deadline_s, SPECULATIVE_WAIT_S) if speculative else deadline_s)
+    except Exception as err:
+        session = _get_session(meeting_id) if meeting_id else None
+        if session is None:
+            if speculative and not future.done():
+                return _serve_local(text, "speculative")
+            if LOCAL_FALLBACK:
+                _log(f"❌  generation failed ({type(err).__name__}): {err}")
+                return _serve_local(text, "fallback")
+            if isinstance(err, TimeoutError) and not isinstance(err, DeadlineExceeded):
+                METRICS.inc("mindmap_deadline_exceeded_total")
+                raise DeadlineExceeded(f"no map within {deadline_s:.1f}s") from err
+            raise
+        METRICS.inc("mindmap_stale_served_total", reason=type(err).__name__)
+        _log(f"🥖 serving last good map ({type(err).__name__})")
+        _STALE.set(True)
+        return session.mindmap
+
+
+# Public helper that honours the USE_SAMPLE flag
+def build_map(_: str | None = None, meeting_id: str | None = None,
+              deadline_s: float = REQUEST_DEADLINE_S, final: bool = False) -> MindMap:
+    global _CACHED_SAMPLE_MAP
+
+    if not USE_SAMPLE:
+        # Fall back to live behaviour
+        if meeting_id:
+            _remember_transcript(meeting_id, _ or "")
+        text = _clean(_ or "")
+        tier = _TIER.set(_route(text, meeting_id, final, deadline_s))
+        try:
+            cached = _cache_lookup(text, meeting_id)
+            if cached is not None:
+                return cached
+            return _build_within_deadline(text, meeting_id, deadline_s, final)
+        finally:
+            _TIER.reset(tier)
+
+    # Sample mode
+    if _CACHED_SAMPLE_MAP is None:
+        _log("⚡ Generating mind-map from hard-coded transcript …")
+        _CACHED_SAMPLE_MAP = _build_map_openai(_clean(_sample_transcript()))
+    return _CACHED_SAMPLE_MAP
+
+
+# ──────────────────── Async generation path ─────────────────
+# `build_map_async` is the asyncio twin of `build_map` for callers that keep
+# many generations in flight at once.  Each event loop gets one AsyncOpenAI
+# client on a shared keep-alive connection pool, and a semaphore caps how
+# many completions are outstanding.  Requests are routed to a model tier and
+# go through that tier's breaker and the deadline like the sync path, but
+# are not hedged, and a failure or a missed deadline is raised to the caller
+# rather than answered with a stale or local map.  `bench/bench_async.py`
+# drives it against `bench/fake_openai.py`.
+
+LLM_MAX_CONCURRENCY = 64
+LLM_TIMEOUT_S = 90
+LLM_CONNECT_TIMEOUT_S = 5
+HTTP_MAX_CONNECTIONS = 100
+HTTP_MAX_KEEPALIVE = 32
+HTTP_KEEPALIVE_EXPIRY_S = 30
+
+# One (client, semaphore) per loop: neither may be shared across loops.
+_ASYNC_STATE: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+# asyncio is imported inside these functions rather than at module level: a
+# running loop means it is loaded already, and the sync path never needs it.
+
+
+def _async_state() -> tuple:
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    state = _ASYNC_STATE.get(loop)
+    if state is None:
+        import httpx
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_S,
+            ),
+            timeout=httpx.Timeout(LLM_TIMEOUT_S, connect=LLM_CONNECT_TIMEOUT_S),
+        )
+        client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client)
+        state = (client, asyncio.Semaphore(LLM_MAX_CONCURRENCY))
+        _ASYNC_STATE[loop] = state
+    return state
+
+
+async def _complete_async(messages: list) -> MindMap:
+    import asyncio
+
+    client, limit = _async_state()
+    model, tier = _tier_model(), _TIER.get()
+    start = time.monotonic()
+    deadline = _DEADLINE.get() or start + REQUEST_DEADLINE_S
+    breaker = _admit(tier)
+    began = None  # set once the model is actually called
+    try:
+        async with limit, _rate_limit_async(model, messages, deadline) as settle:
+            began = time.monotonic()
+            with METRICS.stage("llm"):
+                res = await client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    response_format={"type": "json_object"},
+                    timeout=max(deadline - began, 0.1),
+                )
+            took = time.monotonic() - began
+            settle(res)
+    except BaseException as err:  # cancelled by the deadline included
+        # Every exit must hand back the half-open probe slot `_admit` took.
+        if began is None:
+            breaker.release()  # never reached the model
+        elif isinstance(err, asyncio.CancelledError) or _is_timeout(err):
+            breaker.timed_out(deadline - start)
+        else:
+            breaker.record(False)
+        raise
+    breaker.record(True)
+    _LATENCIES[tier].add(took)
+    _record_usage(res)
+    return _parse_completion(res.choices[0].message.content)
+
+
+async def _build_fresh_async(text: str) -> MindMap:
+    text = _fit_budget(text)
+    if count_tokens(text) <= MAX_INPUT_TOKENS:
+        return await _complete_async(_fresh_messages(text))
+    import asyncio
+
+    windows = _split_windows(text)
+    partials = await asyncio.gather(*(_complete_async(_fresh_messages(w)) for w in windows))
+    return _merge_maps(list(partials))
+
+
+async def _generate_async(text: str, meeting_id: str | None) -> MindMap:
+    if meeting_id:
+        ready, messages, offset = _plan_session(text, meeting_id)
+        if ready is not None:
+            return ready
+        if messages:
+            mindmap = await _complete_async(messages)
+        else:
+            mindmap = await _build_fresh_async(text)
+        _finish_session(meeting_id, text, offset, mindmap)
+    else:
+        mindmap = await _build_fresh_async(text)
+    _cache_store(text, mindmap)
+    return mindmap
+
+
+async def build_map_async(text: str, meeting_id: str | None = None,
+                          deadline_s: float = REQUEST_DEADLINE_S, final: bool = False) -> MindMap:
+    """Async `build_map`: same cache, sessions, routing and deadline, with a
+    non-blocking LLM call.  Raises DeadlineExceeded when `deadline_s` passes."""
+    import asyncio
+
+    if meeting_id:
+        _remember_transcript(meeting_id, text)
+    text = _clean(text)
+    # Set inside this task only: concurrent calls keep their own tier and deadline.
+    tier = _TIER.set(_route(text, meeting_id, final, deadline_s))
+    deadline = _DEADLINE.set(time.monotonic() + deadline_s)
+    try:
+        cached = _cache_lookup(text, meeting_id)
+        if cached is not None:
+            return cached
+        try:
+            return await asyncio.wait_for(_generate_async(text, meeting_id), deadline_s)
+        except asyncio.TimeoutError as err:
+            if isinstance(err, DeadlineExceeded):
+                raise
+            METRICS.inc("mindmap_deadline_exceeded_total")
+            raise DeadlineExceeded(f"no map within {deadline_s:.1f}s") from err
+    finally:
+        _DEADLINE.reset(deadline)
+        _TIER.reset(tier)
+
+
+async def close_async_client() -> None:
+    """Release the pooled connections of the current loop's client."""
+    import asyncio
+
+    state = _ASYNC_STATE.pop(asyncio.get_running_loop(), None)
+    if state is not None:
+        await state[0].close()
+
+
+# ───────────────────── Streaming output ────────────────────
+# With `"stream": true` the handler flushes every node and edge to the client
+# the moment the model has finished writing it, instead of waiting for the
+# whole completion.  `_MapStreamParser` scans the token stream and cuts out
+# each complete element of the top-level "nodes" / "edges" arrays.
+
+
+class _MapStreamParser:
+    """Incremental scanner for `{"nodes": [...], "edges": [...]}` output."""
+
+    _MODELS = {"nodes": Node, "edges": Edge}
+
+    def __init__(self):
+        self.raw = ""
+        self._depth = 0
+        self._in_string = self._escaped = False
+        self._string_start = -1
+        self._key = None     # last string literal seen directly in the object
+        self._array = None   # "nodes" / "edges" while inside that array
+        self._item_start = -1
+
+    def feed(self, chunk: str) -> "List[tuple[str, BaseModel]]":
+        """Consume more model output; return the elements it completed."""
+        done = []
+        base = len(self.raw)
+        self.raw += chunk
+        for i, ch in enumerate(chunk, base):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._key = json.loads(self.raw[self._string_start:i + 1])
+            elif ch == '"':
+                self._in_string, self._string_start = True, i
+            elif ch in "{[":
+                if ch == "[" and self._depth == 1:
+                    self._array = self._key if self._key in self._MODELS else None
+                elif ch == "{" and self._depth == 2 and self._array:
+                    self._item_start = i
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if ch == "}" and self._depth == 2 and self._item_start >= 0:
+                    item = self._parse_item(self.raw[self._item_start:i + 1])
+                    if item is not None:
+                        done.append((self._array[:-1], item))
+                    self._item_start = -1
+                elif ch == "]" and self._depth == 1:
+                    self._array = None
+        return done
+
+    def _parse_item(self, raw: str) -> "BaseModel | None":
+        try:
+            return self._MODELS[self._array].model_validate_json(raw)
+        except ValidationError:
+            return None  # the final whole-map validation reports it
+
+
+def _complete_stream(messages: list) -> "Iterator[tuple[str, BaseModel]]":
+    """Streaming `_complete`: yields ("node", Node) / ("edge", Edge) as they
+    are generated, then ("map", MindMap) for the validated whole.  Bound by
+    the current deadline and the tier's breaker, but not hedged."""
+    start = time.perf_counter()
+    tier, model = _TIER.get(), _tier_model()
+    admitted = time.monotonic()
+    deadline = _DEADLINE.get() or admitted + REQUEST_DEADLINE_S
+    breaker = _admit(tier)
+    began = None  # set once the model is actually called
+    try:
+        with _rate_limit(model, messages, deadline) as settle:
+            began = time.monotonic()
+            stream = _client().chat.completions.create(
+                model=model,
+                messages=messages,
+                response_format={"type": "json_object"},
+                stream=True,
+                stream_options={"include_usage": True},
+                timeout=max(deadline - began, 0.1),
+            )
+            parser = _MapStreamParser()
+            first = True
+            for chunk in stream:
+                if time.monotonic() >= deadline:
+                    getattr(stream, "close", lambda: None)()
+                    METRICS.inc("mindmap_deadline_exceeded_total")
+                    raise DeadlineExceeded(f"stream unfinished after {deadline - admitted:.1f}s")
+                if getattr(chunk, "usage", None):
+                    _record_usage(chunk)
+                    settle(chunk)
+                if not chunk.choices:
+                    continue
+                for item in parser.feed(chunk.choices[0].delta.content or ""):
+                    if first:
+                        METRICS.observe("mindmap_stream_first_element_seconds",
+                                        time.perf_counter() - start)
+                        first = False
+                    yield item
+    except BaseException as err:  # the client hanging up (GeneratorExit) included
+        if began is None or isinstance(err, GeneratorExit):
+            breaker.release()
+        elif _is_timeout(err):
+            breaker.timed_out(deadline - admitted)
+        else:
+            breaker.record(False)
+        raise
+    breaker.record(True)
+    _LATENCIES[tier].add(time.monotonic() - began)
+    METRICS.observe("mindmap_stage_seconds", time.perf_counter() - start, stage="llm")
+    yield "map", _parse_completion(parser.raw)
+
+
+def build_map_stream(text: str, meeting_id: str | None = None,
+                     deadline_s: float = REQUEST_DEADLINE_S) -> "Iterator[tuple[str, BaseModel]]":
+    """Streaming `build_map`: yields nodes and edges as soon as they exist,
+    ending with ("map", MindMap).  Cache hits, unchanged sessions and
+    map-reduced transcripts cannot stream and are replayed in one go.  When
+    the model has to be called, a ("draft", MindMap) from the local engine
+    comes first.  The model must be done within `deadline_s`; there is no
+    stale answer to fall back to once elements have been sent."""
+    if USE_SAMPLE:
+        yield from _replay(build_map(text, meeting_id))
+        return
+    if meeting_id:
+        _remember_transcript(meeting_id, text)
+    text = _clean(text)
+    deadline = _DEADLINE.set(time.monotonic() + deadline_s)
+    tier = _TIER.set(_route(text, meeting_id, False, deadline_s))
+    try:
+        yield from _stream_events(text, meeting_id)
+    finally:
+        _TIER.reset(tier)
+        _DEADLINE.reset(deadline)
+
+
+def _replay(mindmap: MindMap) -> "Iterator[tuple[str, BaseModel]]":
+    yield from (("node", n) for n in mindmap.nodes)
+    yield from (("edge", e) for e in mindmap.edges)
+    yield "map", mindmap
+
+
+def _stream_events(text: str, meeting_id: str | None) -> "Iterator[tuple[str, BaseModel]]":
+    cached = _cache_lookup(text, meeting_id)
+    if cached is not None:
+        yield from _replay(cached)
+        return
+
+    ready, messages, offset = None, [], len(text)
+    if meeting_id:
+        ready, messages, offset = _plan_session(text, meeting_id)
+    if ready is not None:
+        yield from _replay(ready)
+        return
+    with METRICS.stage("local"):
+        yield "draft", build_map_local(text)
+    streamed = bool(messages) or count_tokens(text) <= MAX_INPUT_TOKENS
+    if streamed:
+        for kind, item in _complete_stream(messages or _fresh_messages(text)):
+            if kind == "map":
+                mindmap = item
+            else:
+                yield kind, item
+    else:
+        mindmap = _build_map_openai(text)
+    if meeting_id:
+        _finish_session(meeting_id, text, offset, mindmap)
+    _cache_store(text, mindmap)
+    if streamed:
+        yield "map", mindmap
+    else:
+        yield from _replay(mindmap)
+
+
+# ────────────────────── Graph versions ─────────────────────
+# Each meeting's published map is kept with a version number that only
+# moves when the graph actually changes.  Pollers send back the version they
+# hold (`since`, or If-None-Match with the ETag) and get a 304 or just the
+# added / removed / changed nodes and edges instead of the whole map.
+
+GRAPH_HISTORY = 16  # versions per meeting a delta can still be computed from
+
+# Process-wide and seeded from the clock, so versions (and the ETags built
+# from them) never repeat for a meeting, not even across restarts.
+_VERSIONS = itertools.count(int(time.time() * 1000))
+
+
+class _MeetingGraph:
+    """Versioned id → node / (source, target) → edge indexes for one meeting."""
+
+    def __init__(self):
+        self.version = 0
+        self.nodes: "dict[str, Node]" = {}
+        self.edges: "dict[tuple[str, str], Edge]" = {}
+        self.touched = time.monotonic()
+        self._history: "OrderedDict[int, tuple[dict, dict]]" = OrderedDict()
+
+    def publish(self, mindmap: MindMap) -> int:
+        """Adopt `mindmap`; bump the version only if something changed."""
+        self.touched = time.monotonic()
+        nodes = {n.id: n for n in mindmap.nodes}
+        edges = {(e.source, e.target): e for e in mindmap.edges}
+        if self.version and nodes == self.nodes and edges == self.edges:
+            return self.version
+        self.version = next(_VERSIONS)
+        self.nodes, self.edges = nodes, edges
+        self._history[self.version] = (nodes, edges)
+        while len(self._history) > GRAPH_HISTORY:
+            self._history.popitem(last=False)
+        return self.version
+
+    def delta(self, since: int) -> "dict | None":
+        """Changes from version `since` to now, or None if it is too old."""
+        if since not in self._history:
+            return None
+        old_nodes, old_edges = self._history[since]
+
+        def diff(old: dict, new: dict, removed_key):
+            return {
+                "added": [v for k, v in new.items() if k not in old],
+                "removed": [removed_key(k) for k in old if k not in new],
+                "changed": [v for k, v in new.items() if k in old and old[k] != v],
+            }
+
+        return {
+            "nodes": diff(old_nodes, self.nodes, lambda k: k),
+            "edges": diff(old_edges, self.edges, lambda k: {"source": k[0], "target": k[1]}),
+        }
+
+    def snapshot(self) -> dict:
+        return {"nodes": list(self.nodes.values()), "edges": list(self.edges.values())}
+
+
+_GRAPHS: "OrderedDict[str, _MeetingGraph]" = OrderedDict()
+_GRAPHS_LOCK = threading.Lock()
+
+
+def publish_map(meeting_id: str, mindmap: MindMap, since: "int | None" = None) -> "tuple[int, dict]":
+    """Record `mindmap` as the meeting's current graph.
+
+    Returns `(version, body)` where `body` is `{}` when the caller already
+    has `since == version`, a `{"delta": …}` when `since` is recent enough,
+    and the full map otherwise; `version` is included in every non-empty body.
+    """
+    with _GRAPHS_LOCK:
+        graph = _GRAPHS.pop(meeting_id, None) or _MeetingGraph()
+        now = time.monotonic()
+        while _GRAPHS:
+            oldest_id, oldest = next(iter(_GRAPHS.items()))
+            if now - oldest.touched < SESSION_TTL_S and len(_GRAPHS) < MAX_SESSIONS:
+                break
+            del _GRAPHS[oldest_id]
+        _GRAPHS[meeting_id] = graph
+        version = graph.publish(mindmap)
+        if since == version:
+            return version, {}
+        delta = graph.delta(since) if since is not None else None
+        if delta is not None:
+            return version, {"version": version, "since": since, "delta": delta}
+        return version, {"version": version, **graph.snapshot()}
+
+
+# ────────────────────── Segment index ──────────────────────
+# Caption exports carry timestamps that the map itself has no room for.
+# Each meeting's latest transcript is kept, and on first lookup parsed into
+# a `_SegmentIndex`: its segments (time range → text; untimed live text is
+# cut into sentences and located by character offset) plus an inverted
+# term index.  `GET …/search?meeting_id=…` answers "where was this
+# discussed" from it without a model call: `q=` for matching passages and
+# the nodes they support, `node=` for the passages behind one node of the
+# current map, neither for every node's.
+
+SEARCH_RESULTS = 5
+SEARCH_CONTEXT = 1   # neighbouring segments on each side a passage spans
+NODE_PASSAGES = 3    # passages linked to each node
+
+
+def _terms(text: str) -> List[str]:
+    """Index terms: content words, plurals folded."""
+    return [w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w
+            for w in _WORD.findall(text.lower()) if w not in _STOPWORDS]
+
+
+class _SegmentIndex:
+    def __init__(self, text: str):
+        clean, segments = normalize_transcript(text)
+        if len(segments) == 1 and segments[0].start is None:
+            segments = [_Segment(None, None, s) for s in _sentences(clean)]
+        self.segments = segments
+        self.offsets: List[int] = []   # where each segment starts in the clean text
+        self.postings: "dict[str, List[int]]" = defaultdict(list)
+        offset = 0
+        for i, segment in enumerate(segments):
+            self.offsets.append(offset)
+            offset += len(segment.text) + 1
+            for term in set(_terms(segment.text)):
+                self.postings[term].append(i)
+        self._links: "tuple[int, dict] | None" = None
+
+    def _passage(self, lo: int, hi: int, score: float) -> dict:
+        first, last = self.segments[lo], self.segments[hi]
+        end = last.end
+        if end is None and hi + 1 < len(self.segments):
+            end = self.segments[hi + 1].start
+        return {
+            "start": first.start,
+            "end": end,
+            "offset": [self.offsets[lo], self.offsets[hi] + len(last.text)],
+            "text": " ".join(s.text for s in self.segments[lo:hi + 1]),
+            "score": round(score, 3),
+        }
+
+    def search(self, query: str, limit: int = SEARCH_RESULTS) -> List[dict]:
+        """Best non-overlapping passages for `query`, best first.
+
+        A segment scores the IDF of every query term found in it or its
+        SEARCH_CONTEXT neighbours, so a phrase broken across caption lines
+        still matches as a whole."""
+        n = len(self.segments)
+        found: "defaultdict[int, dict]" = defaultdict(dict)
+        for term in set(_terms(query)):
+            hits = self.postings.get(term)
+            if not hits:
+                continue
+            weight = math.log(1 + n / len(hits))
+            for i in hits:
+                for j in range(max(0, i - SEARCH_CONTEXT), min(n, i + SEARCH_CONTEXT + 1)):
+                    found[j][term] = weight
+        scores = {i: sum(weights.values()) for i, weights in found.items()}
+        taken: List[tuple] = []
+        for i in sorted(scores, key=lambda i: (-scores[i], i)):
+            lo, hi = max(0, i - SEARCH_CONTEXT), min(n - 1, i + SEARCH_CONTEXT)
+            if any(lo <= b and a <= hi for a, b, _ in taken):
+                continue
+            taken.append((lo, hi, scores[i]))
+            if len(taken) == limit:
+                break
+        return [self._passage(lo, hi, score) for lo, hi, score in taken]
+
+    def links(self, graph: "_MeetingGraph") -> "dict[str, List[dict]]":
+        """Node id → its supporting passages, for the graph's current version."""
+        cached = self._links
+        if cached is None or cached[0] != graph.version:
+            nodes = list(graph.nodes.values())
+            cached = self._links = (graph.version,
+                                    {n.id: self.search(n.label, NODE_PASSAGES) for n in nodes})
+        return cached[1]
+
+    def related(self, graph: "_MeetingGraph", query: str, passages: List[dict]) -> List[dict]:
+        """Nodes named by `query` or supported by one of `passages`."""
+        terms = set(_terms(query))
+        spans = [p["offset"] for p in passages]
+        related = []
+        for node_id, linked in self.links(graph).items():
+            node = graph.nodes.get(node_id)
+            if node is None:
+                continue
+            if terms & set(_terms(node.label)) or any(
+                    a < hi and lo < b for a, b in (p["offset"] for p in linked) for lo, hi in spans):
+                related.append({"id": node.id, "label": node.label})
+        return related
+
+
+# meeting id → [latest raw transcript, its index once built, last touched]
+_TRANSCRIPTS: "OrderedDict[str, list]" = OrderedDict()
+_TRANSCRIPTS_LOCK = threading.Lock()
+
+
+def _remember_transcript(meeting_id: str, text: str) -> None:
+    """Keep `text` for lookups; indexing waits until the first one."""
+    now = time.monotonic()
+    with _TRANSCRIPTS_LOCK:
+        entry = _TRANSCRIPTS.pop(meeting_id, None)
+        if entry is None or entry[0] != text:
+            entry = [text, None, now]
+        entry[2] = now
+        _TRANSCRIPTS[meeting_id] = entry
+        while _TRANSCRIPTS:
+            oldest = next(iter(_TRANSCRIPTS.values()))
+            if now - oldest[2] < SESSION_TTL_S and len(_TRANSCRIPTS) <= MAX_SESSIONS:
+                break
+            _TRANSCRIPTS.popitem(last=False)
+
+
+def segment_index(meeting_id: str) -> "_SegmentIndex | None":
+    with _TRANSCRIPTS_LOCK:
+        entry = _TRANSCRIPTS.get(meeting_id)
+    if entry is None:
+        return None
+    if entry[1] is None:
+        entry[1] = _SegmentIndex(entry[0])  # a racing lookup builds the same index
+    return entry[1]
+
+
+# ─────────────────────── Batch mode ────────────────────────
+# Backfilling an archive means thousands of transcripts.  `build_batch` maps
+# them on a bounded worker pool and yields results as they complete.  POST
+# NDJSON (`{"id", "text"}` per line) to `…/batch` to do it over HTTP, or run
+# `python backend.py batch DIR` to map every transcript file under DIR.
+
+BATCH_WORKERS = 8
+BATCH_DEADLINE_S = 300     # per transcript; long ones are map-reduced
+BATCH_EXTENSIONS = (".txt", ".vtt", ".srt")
+
+
+def _batch_one(item: dict) -> dict:
+    """Map one entry to `{"id", "map"}` (plus "local" if the local engine
+    answered) or `{"id", "error"}`; never raises."""
+    out = {"id": item.get("id")}
+    _PRIORITY.set("batch")  # behind live requests for rate-limit budget
+    try:
+        text = item.get("text")
+        if not isinstance(text, str) or not text.strip():
+            raise ValueError("missing or empty 'text'")
+        out["map"] = build_map(text, deadline_s=BATCH_DEADLINE_S, final=True)
+        if _LOCAL.get():
+            out["local"] = _LOCAL.get()
+    except Exception as err:
+        out["error"] = f"{type(err).__name__}: {err}"
+    METRICS.inc("mindmap_batch_items_total",
+                result="error" if "error" in out else "local" if "local" in out else "ok")
+    return out
+
+
+def build_batch(items: "Iterable[dict]", workers: int = BATCH_WORKERS) -> "Iterator[dict]":
+    """Yield a `_batch_one` result per item, in completion order.
+
+    At most `workers` items run at once, and `items` is only read as slots
+    free up, so an archive-sized input is never held in memory."""
+    items = iter(items)
+    pending: set = set()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+        while True:
+            for item in items:
+                # Each item gets its own context so its `_LOCAL` flag is its own.
+                pending.add(pool.submit(copy_context().run, _batch_one, item))
+                if len(pending) >= workers:
+                    break
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def _ndjson_items(lines: "Iterable[bytes]") -> "Iterator[dict]":
+    """Batch entries from NDJSON lines; ids default to the line number."""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            item = None
+        if not isinstance(item, dict):
+            item = {}  # reported back as an error line
+        item.setdefault("id", number)
+        yield item
+
+
+def _batch_cli(argv: List[str]) -> None:
+    """`python backend.py batch DIR`: map every transcript under DIR.
+
+    Results are appended to --out as NDJSON.  The file doubles as the
+    checkpoint: a re-run skips every file that already has a model's map
+    there.  Maps only the local engine could make count as failures and
+    are retried, like local answers to jobs."""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="backend.py batch",
+                                     description="Map every transcript file under a directory.")
+    parser.add_argument("directory")
+    parser.add_argument("--out", default="mindmaps.ndjson",
+                        help="NDJSON results, also the resume checkpoint")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS,
+                        help="transcripts mapped concurrently")
+    args = parser.parse_args(argv)
+
+    done: set = set()
+    tail = ""
+    if os.path.exists(args.out):
+        with open(args.out, encoding="utf-8") as f:
+            for tail in f:
+                try:
+                    result = json.loads(tail)
+                except ValueError:
+                    continue  # torn last line of an interrupted run
+                if "map" in result and "local" not in result:
+                    done.add(result["id"])
+    sizes = {}
+    for folder, _dirs, files in os.walk(args.directory):
+        for name in files:
+            path = os.path.join(folder, name)
+            rel = os.path.relpath(path, args.directory)
+            if name.lower().endswith(BATCH_EXTENSIONS) and rel not in done:
+                sizes[rel] = os.path.getsize(path)
+    _log(f"📦 {len(sizes)} transcripts to map, {len(done)} already done")
+
+    def items():
+        for rel in sorted(sizes):
+            with open(os.path.join(args.directory, rel), encoding="utf-8", errors="replace") as f:
+                yield {"id": rel, "text": f.read()}
+
+    start = time.monotonic()
+    finished = failed = nbytes = 0
+    with open(args.out, "a", encoding="utf-8") as out:
+        if tail and not tail.endswith("\n"):
+            out.write("\n")
+        for result in build_batch(items(), args.workers):
+            out.write(to_json(result).decode() + "\n")
+            out.flush()
+            finished += 1
+            failed += "error" in result or "local" in result
+            nbytes += sizes[result["id"]]
+            elapsed = time.monotonic() - start
+            rate = finished / elapsed
+            eta = (len(sizes) - finished) / rate
+            _log(f"📦 {finished}/{len(sizes)} ({failed} failed) · {rate:.2f} files/s · "
+                 f"{nbytes / elapsed / 1e3:.1f} KB/s · ETA {eta:.0f}s"
+                 + (f" · {result['id']}: {result['error']}" if "error" in result else "")
+                 + (f" · {result['id']}: local map only" if "local" in result else ""))
+
+
+# ──────────────────────── Job queue ────────────────────────
+# A POST with `"async": true` (or `Prefer: respond-async`) becomes a job:
+# it is stored in a SQLite queue and answered at once with 202 and a job id,
+# so no connection is held open for the model round-trip.  Worker threads
+# drain the queue, retrying with backoff; clients poll — or long-poll with
+# `?wait=SECONDS` — `GET …/jobs/{id}`.  Jobs a crash or restart left
+# "running" are queued again when the queue is next opened.
+
+JOBS_DB_PATH = os.getenv("MINDMAP_JOBS_DB") or os.path.join(
+    tempfile.gettempdir(), "mindmap-jobs.sqlite3"
+)
+JOB_WORKERS = 4
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_BASE_S = 2       # backoff before attempt n+1: 2 s, 4 s, …
+JOB_DEADLINE_S = BATCH_DEADLINE_S
+JOB_MAX_WAIT_S = 25        # longest long-poll, under common proxy timeouts
+JOB_TTL_S = 24 * 60 * 60   # finished jobs are kept this long
+
+
+class _JobQueue:
+    """SQLite-backed job table plus the worker threads that drain it."""
+
+    def __init__(self, db_path: str, workers: int = JOB_WORKERS):
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, "
+            "request TEXT NOT NULL, result TEXT, error TEXT, attempts INTEGER NOT NULL, "
+            "run_after REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_after)")
+        # A job that keeps taking the process down with it is not retried forever.
+        requeued = self._db.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+            "error = 'interrupted' WHERE status = 'running'", (JOB_MAX_ATTEMPTS,)
+        ).rowcount
+        self._db.commit()
+        if requeued:
+            _log(f"♻️  recovered {requeued} interrupted job(s)")
+        # One lock for the connection; waiters on it hear about every change.
+        self._changed = threading.Condition()
+        for n in range(workers):
+            threading.Thread(target=self._work, name=f"job-{n}", daemon=True).start()
+
+    def submit(self, request: dict) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._changed:
+            self._db.execute(
+                "INSERT INTO jobs VALUES (?, 'queued', ?, NULL, NULL, 0, ?, ?)",
+                (job_id, json.dumps(request), now, now),
+            )
+            self._db.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated < ?",
+                (now - JOB_TTL_S,),
+            )
+            self._db.commit()
+            self._changed.notify_all()
+        METRICS.inc("mindmap_jobs_total", event="queued")
+        return job_id
+
+    def get(self, job_id: str, wait_s: float = 0) -> "dict | None":
+        """The job's public view; with `wait_s`, block until it finishes or
+        `wait_s` passes, whichever is first."""
+        until = time.monotonic() + wait_s
+        with self._changed:
+            while True:
+                row = self._db.execute(
+                    "SELECT status, result, error, attempts FROM jobs WHERE id = ?", (job_id,)
+                ).fetchone()
+                left = until - time.monotonic()
+                if row is None or row[0] in ("done", "failed") or left <= 0:
+                    break
+                self._changed.wait(left)
+        if row is None:
+            return None
+        status, result, error, attempts = row
+        view = {"job_id": job_id, "status": status, "attempts": attempts}
+        if result is not None:
+            view.update(json.loads(result))
+        if error is not None:
+            view["error"] = error
+        return view
+
+    def _claim(self) -> "tuple[str, dict, int] | None":
+        row = self._db.execute(
+            "SELECT id, request, attempts FROM jobs WHERE status = 'queued' AND run_after <= ? "
+            "ORDER BY run_after LIMIT 1", (time.time(),)
+        ).fetchone()
+        if row is None:
+            return None
+        # Guarded on status so another process sharing the file cannot
+        # claim the same job.
+        claimed = self._db.execute(
+            "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated = ? "
+            "WHERE id = ? AND status = 'queued'", (time.time(), row[0])
+        ).rowcount
+        self._db.commit()
+        return (row[0], json.loads(row[1]), row[2] + 1) if claimed else None
+
+    def _finish(self, job_id: str, status: str, result: "str | None",
+                error: "str | None", run_after: float = 0) -> None:
+        with self._changed:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, run_after = ?, updated = ? "
+                "WHERE id = ?", (status, result, error, run_after, time.time(), job_id),
+            )
+            self._db.commit()
+            self._changed.notify_all()
+        METRICS.inc("mindmap_jobs_total", event=status)
+
+    def _work(self) -> None:
+        _PRIORITY.set("job")
+        while True:
+            with self._changed:
+                job = self._claim()
+                while job is None:
+                    self._changed.wait(1.0)  # also wakes retries whose backoff ended
+                    job = self._claim()
+            job_id, request, attempts = job
+            _TRACE_ID.set(job_id[:12])
+            _STALE.set(False)
+            _LOCAL.set("")
+            try:
+                # Jobs queued before "final" was stored all ran as final passes.
+                mindmap = build_map(request["text"], request.get("meeting_id"),
+                                    JOB_DEADLINE_S, request.get("final", True))
+                if _LOCAL.get() and attempts < JOB_MAX_ATTEMPTS:
+                    raise RuntimeError("model unavailable; local map only")
+                if _STALE.get() and attempts < JOB_MAX_ATTEMPTS:
+                    raise RuntimeError("model unavailable; last good map only")
+            except Exception as err:
+                error = f"{type(err).__name__}: {err}"
+                if attempts < JOB_MAX_ATTEMPTS:
+                    delay = JOB_RETRY_BASE_S * 2 ** (attempts - 1)
+                    _log(f"🔁 job attempt {attempts} failed ({error}); retrying in {delay}s")
+                    self._finish(job_id, "queued", None, error, time.time() + delay)
+                else:
+                    _log(f"❌  job failed after {attempts} attempts: {error}")
+                    self._finish(job_id, "failed", None, error)
+                continue
+            result = {"map": mindmap.model_dump(mode="json")}
+            if _STALE.get():
+                result["stale"] = True
+            if _LOCAL.get():
+                result["local"] = _LOCAL.get()
+            self._finish(job_id, "done", json.dumps(result), None)
+
+
+_JOBS: "_JobQueue | None" = None
+_JOBS_LOCK = threading.Lock()
+
+
+def open_job_queue() -> _JobQueue:
+    """The process's job queue, opened (and its workers started) on first
+    use.  Long-running servers call it at start-up to resume queued work."""
+    global _JOBS
+    with _JOBS_LOCK:
+        if _JOBS is None:
+            _JOBS = _JobQueue(JOBS_DB_PATH)
+        return _JOBS
+
+
+# ──────────────────────── Push ingestion ───────────────────
+# Instead of re-posting the whole transcript on a timer, a client can open a
+# WebSocket to `…/push?meeting_id=…` and send only the new final-result
+# fragments (`{"type": "append", "text": …}`).  The server accumulates them
+# and regenerates when it is worth it: enough new text, a pause in the
+# speech after something substantive, or a change of topic.  Maps go back
+# down the same socket as `{"type": "map", "reason": …}` carrying the
+# usual `publish_map` body (full map or delta).  `{"type": "final"}` asks
+# for the quality pass; the server sends it and closes.  Long-running
+# servers only: a serverless function cannot hold the connection.
+
+PUSH_VOLUME_CHARS = 600      # new text that always warrants a new map
+PUSH_SILENCE_S = 3.0         # a pause this long after …
+PUSH_SILENCE_CHARS = 150     # … at least this much new text
+PUSH_SHIFT_CHARS = 200       # new text needed before a topic shift counts
+PUSH_SHIFT_WINDOW = 1_200    # preceding text the new text is compared with
+PUSH_SHIFT_OVERLAP = 0.2     # below this share of familiar words: new topic
+PUSH_MIN_INTERVAL_S = 5      # between regenerations, the final one excepted
+PUSH_REFRESH_S = 3           # a speculative local draft is followed up after
+PUSH_IDLE_TIMEOUT_S = 5 * 60
+PUSH_MAX_MESSAGE_BYTES = 256 * 1024
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class _WebSocket:
+    """Server side of RFC 6455 over a handler's rfile / wfile: text
+    messages, ping / pong and close.  No extensions, no subprotocols."""
+
+    def __init__(self, rfile, wfile, max_bytes: int = PUSH_MAX_MESSAGE_BYTES):
+        self._rfile, self._wfile = rfile, wfile
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()  # the reader and the push worker both write
+        self.closed = False
+
+    def _read(self, n: int) -> bytes:
+        data = self._rfile.read(n)
+        if len(data) < n:
+            raise ConnectionError("client went away")
+        return data
+
+    def _frame(self) -> "tuple[bool, int, bytes]":
+        head = self._read(2)
+        fin, opcode, masked = head[0] & 0x80, head[0] & 0x0F, head[1] & 0x80
+        length = head[1] & 0x7F
+        if length == 126:
+            length = int.from_bytes(self._read(2), "big")
+        elif length == 127:
+            length = int.from_bytes(self._read(8), "big")
+        if not masked:
+            raise ValueError("unmasked client frame")
+        if length > self._max_bytes:
+            self.close(1009)
+            raise ValueError(f"frame of {length} bytes")
+        mask = self._read(4)
+        payload = self._read(length)
+        # Unmask as one big integer XOR rather than byte by byte.
+        key = (mask * (length // 4 + 1))[:length]
+        payload = (int.from_bytes(payload, "big") ^ int.from_bytes(key, "big")).to_bytes(length, "big")
+        return bool(fin), opcode, payload
+
+    def messages(self) -> "Iterator[str]":
+        """Yield text messages until the client closes the connection."""
+        parts: List[bytes] = []
+        while True:
+            fin, opcode, payload = self._frame()
+            if opcode == 0x8:
+                self.close()
+                return
+            if opcode == 0x9:
+                self._write(0xA, payload)
+                continue
+            if opcode not in (0x0, 0x1):
+                continue  # pong; binary messages are not part of the protocol
+            parts.append(payload)
+            if sum(map(len, parts)) > self._max_bytes:
+                self.close(1009)
+                raise ValueError("message too large")
+            if fin:
+                yield b"".join(parts).decode()
+                parts = []
+
+    def _write(self, opcode: int, payload: bytes) -> None:
+        size = len(payload)
+        if size < 126:
+            head = bytes((0x80 | opcode, size))
+        elif size < 1 << 16:
+            head = bytes((0x80 | opcode, 126)) + size.to_bytes(2, "big")
+        else:
+            head = bytes((0x80 | opcode, 127)) + size.to_bytes(8, "big")
+        with self._lock:
+            if not self.closed:
+                self._wfile.write(head + payload)
+
+    def send(self, obj) -> None:
+        self._write(0x1, to_json(obj))
+
+    def close(self, code: int = 1000) -> None:
+        self._write(0x8, code.to_bytes(2, "big"))
+        self.closed = True
+
+
+def _content_words(text: str) -> set:
+    return {w for w in _WORD.findall(text.lower()) if len(w) > 2 and w not in _FILLER}
+
+
+def _topic_shift(before: str, new: str) -> bool:
+    """Most of `new`'s content words were not heard in `before`."""
+    words = _content_words(new)
+    if not words or not before:
+        return False
+    return len(words & _content_words(before)) / len(words) < PUSH_SHIFT_OVERLAP
+
+
+class _PushIngest:
+    """One push connection's transcript and the policy that decides when it
+    deserves a new map.  `run` (on its own thread) regenerates and sends;
+    the handler thread only appends."""
+
+    def __init__(self, meeting_id: str, socket: _WebSocket, since: "int | None" = None):
+        self.meeting_id = meeting_id
+        self.text = ""
+        self._socket = socket
+        self._since = since
+        self._built = 0              # chars of `text` the last map covers
+        self._heard = time.monotonic()
+        self._last_build = 0.0
+        self._refresh_at = 0.0
+        self._final = self._closed = False
+        self._cond = threading.Condition()
+
+    def append(self, fragment: str) -> None:
+        fragment = _clean(fragment)
+        if not fragment:
+            return
+        METRICS.inc("mindmap_push_fragments_total")
+        METRICS.inc("mindmap_push_bytes_total", len(fragment))
+        with self._cond:
+            self.text = f"{self.text} {fragment}" if self.text else fragment
+            self._heard = time.monotonic()
+            self._cond.notify()
+
+    def finish(self) -> None:
+        with self._cond:
+            self._final = True
+            self._cond.notify()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def _trigger(self, now: float) -> "tuple[str | None, float | None]":
+        """(reason to regenerate now, or None and how long until it may be
+        worth another look; None: not before more text arrives)."""
+        if self._final:
+            return "final", None
+        if self._refresh_at and now >= self._refresh_at:
+            return "refresh", None
+        pending = self.text[self._built:]
+        if len(pending.strip()) < MIN_DELTA_CHARS:
+            return None, (self._refresh_at - now) if self._refresh_at else None
+        wait = self._last_build + PUSH_MIN_INTERVAL_S - now
+        if wait > 0:
+            return None, wait
+        if len(pending) >= PUSH_VOLUME_CHARS:
+            return "volume", None
+        if len(pending) >= PUSH_SHIFT_CHARS and _topic_shift(
+                self.text[max(0, self._built - PUSH_SHIFT_WINDOW):self._built], pending):
+            return "topic", None
+        if len(pending) >= PUSH_SILENCE_CHARS:
+            quiet = now - self._heard
+            return ("silence", None) if quiet >= PUSH_SILENCE_S else (None, PUSH_SILENCE_S - quiet)
+        return None, None
+
+    def run(self) -> None:
+        while True:
+            with self._cond:
+                reason, wait = self._trigger(time.monotonic())
+                while reason is None and not self._closed:
+                    self._cond.wait(wait)
+                    reason, wait = self._trigger(time.monotonic())
+                if reason is None:
+                    return
+                text, self._built = self.text, len(self.text)
+                self._last_build, self._refresh_at = time.monotonic(), 0.0
+            if reason != "final":
+                self._regenerate(text, reason)
+                continue
+            if text:
+                self._regenerate(text, reason)
+            try:
+                self._socket.close()
+            except OSError:
+                pass
+            return
+
+    def _regenerate(self, text: str, reason: str) -> None:
+        METRICS.inc("mindmap_push_regenerations_total", reason=reason)
+        _log(f"📡 regenerating on {reason} ({len(text)} chars)")
+        _STALE.set(False)
+        _LOCAL.set("")
+        try:
+            mindmap = build_map(text, self.meeting_id, REQUEST_DEADLINE_S, final=reason == "final")
+            version, body = publish_map(self.meeting_id, mindmap, self._since)
+            if _LOCAL.get() == "speculative":
+                # The model's map lands shortly; fetch it without waiting for speech.
+                with self._cond:
+                    self._refresh_at = time.monotonic() + PUSH_REFRESH_S
+            if not body:
+                return
+            self._since = version
+            message = {"type": "map", "reason": reason, **body}
+            if _STALE.get():
+                message["stale"] = True
+            if _LOCAL.get():
+                message["local"] = _LOCAL.get()
+            self._socket.send(message)
+        except OSError:
+            self.close()  # the client is gone; its map is cached all the same
+        except Exception as err:
+            METRICS.inc("mindmap_errors_total", kind=type(err).__name__)
+            _log("❌  push regeneration failed:", err)
+            try:
+                self._socket.send({"type": "error", "error": "Mind-map generation failed"})
+            except OSError:
+                self.close()
+
+
+# ──────────────────── HTTP handler class ──────────────────
+
+
+# Responses smaller than this are not worth compressing.
+COMPRESS_MIN_BYTES = 1024
+# Idle keep-alive connections are closed after this many seconds; a little
+# over the UI's 15 s poll so each tab reuses one connection.
+KEEPALIVE_TIMEOUT_S = 20
+# Request bodies may not be larger than this, on the wire or once
+# decompressed; bigger ones are refused with a 413 before they are read.
+MAX_BODY_BYTES = int(os.getenv("MINDMAP_MAX_BODY_BYTES") or 8 * 1024 * 1024)
+# Batch bodies are spooled to disk rather than held, so they may be larger.
+MAX_BATCH_BODY_BYTES = int(os.getenv("MINDMAP_MAX_BATCH_BODY_BYTES") or 256 * 1024 * 1024)
+READ_CHUNK_BYTES = 64 * 1024
+MAX_FIELD_BYTES = 64 * 1024  # any JSON member other than "text"
+
+try:
+    import brotli  # optional: `pip install brotli` enables `br`
+except ImportError:
+    brotli = None
+
+
+def _negotiate_encoding(accept_encoding: str) -> "str | None":
+    offered = {
+        part.split(";")[0].strip().lower()
+        for part in accept_encoding.split(",")
+        if not part.strip().endswith("q=0")
+    }
+    if brotli is not None and "br" in offered:
+        return "br"
+    if "gzip" in offered:
+        return "gzip"
+    return None
+
+
+def _encode(payload: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(payload, quality=4)
+    return gzip.compress(payload, compresslevel=5)
+
+
+class PayloadTooLarge(ValueError):
+    """The request body is over its size limit (answered with 413)."""
+
+
+def _wire_chunks(rfile, headers, limit: int) -> "Iterator[bytes]":
+    """The raw body in pieces of at most READ_CHUNK_BYTES, framed by
+    Content-Length or chunked transfer coding."""
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        total = 0
+        while True:
+            try:
+                size = int(rfile.readline(1024).split(b";")[0], 16)
+            except ValueError:
+                raise ValueError("bad chunk size") from None
+            if size == 0:
+                while rfile.readline(1024).strip():
+                    pass  # trailers
+                return
+            total += size
+            if total > limit:
+                raise PayloadTooLarge(f"body over {limit} bytes")
+            while size:
+                data = rfile.read(min(size, READ_CHUNK_BYTES))
+                if not data:
+                    raise ValueError("body ended early")
+                size -= len(data)
+                yield data
+            rfile.readline(1024)  # CRLF after the chunk
+    length = int(headers.get("content-length") or 0)
+    if length > limit:
+        raise PayloadTooLarge(f"body over {limit} bytes")
+    while length:
+        data = rfile.read(min(length, READ_CHUNK_BYTES))
+        if not data:
+            raise ValueError("body ended early")
+        length -= len(data)
+        yield data
+
+
+def _body_chunks(rfile, headers, limit: int = MAX_BODY_BYTES) -> "Iterator[bytes]":
+    """`_wire_chunks`, undoing any Content-Encoding as they arrive and
+    holding the decompressed size to `limit` too (no decompression bombs)."""
+    chunks = _wire_chunks(rfile, headers, limit)
+    encoding = headers.get("content-encoding", "").strip().lower()
+    if encoding in ("", "identity"):
+        yield from chunks
+        return
+    if encoding == "br" and brotli is not None:
+        decompressor = brotli.Decompressor()
+
+        def inflate(chunk: bytes):
+            yield decompressor.process(chunk)
+    elif encoding in ("gzip", "deflate"):
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS | 32)  # gzip or zlib header
+
+        def inflate(chunk: bytes):
+            while chunk:
+                yield decompressor.decompress(chunk, READ_CHUNK_BYTES)
+                chunk = decompressor.unconsumed_tail
+    else:
+        raise ValueError(f"unsupported Content-Encoding {encoding!r}")
+    total = 0
+    for chunk in chunks:
+        for data in inflate(chunk):
+            total += len(data)
+            if total > limit:
+                raise PayloadTooLarge("decompressed body too large")
+            yield data
+
+
+_DECODER = json.JSONDecoder()
+# The body of a JSON string as whole tokens: plain bytes and complete escapes.
+_STRING_TOKENS = re.compile(rb'[^"\\]*(?:(?:\\u[0-9a-fA-F]{4}|\\[^u])[^"\\]*)*', re.DOTALL)
+
+
+def _read_json_object(chunks: "Iterator[bytes]") -> dict:
+    """Parse a JSON object body as it arrives.
+
+    The "text" member is decoded piece by piece, so the raw body is never
+    held next to the transcript; every other member may take at most
+    MAX_FIELD_BYTES.  An empty body is `{}`."""
+    buf = bytearray()
+    eof = False
+
+    def more() -> bool:
+        nonlocal eof
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            return False
+        buf.extend(chunk)
+        return True
+
+    def skip_ws() -> "int | None":
+        """Drop leading whitespace; the next byte, or None at the end."""
+        while True:
+            stripped = len(buf) - len(buf.lstrip())
+            del buf[:stripped]
+            if buf:
+                return buf[0]
+            if not more():
+                return None
+
+    def value():
+        """One complete JSON value of at most MAX_FIELD_BYTES."""
+        while True:
+            head = bytes(buf[:MAX_FIELD_BYTES + 1]).decode("utf-8", "replace")
+            try:
+                obj, end = _DECODER.raw_decode(head)
+                # A number cut by a chunk boundary ("25" of "2500.5") parses
+                # too: only take it once something that cannot continue it follows.
+                rest = head[end:]
+                if eof or (rest.strip() and rest[0] not in "0123456789.eE+-"):
+                    del buf[:len(head[:end].encode())]
+                    return obj
+            except ValueError:
+                if eof:
+                    raise
+            if len(buf) > MAX_FIELD_BYTES:
+                raise PayloadTooLarge(f"JSON member over {MAX_FIELD_BYTES} bytes")
+            more()
+
+    def string() -> str:
+        """A string's contents, decoded in pieces (buf starts after the quote)."""
+        parts: List[str] = []
+        split_pair = False  # a cut fell inside an escaped surrogate pair
+        while True:
+            # buf starts on an escape boundary; whole tokens run up to the
+            # closing quote or to an escape still cut off by the chunk end.
+            cut = _STRING_TOKENS.match(buf).end()
+            if cut < len(buf) and buf[cut] == 0x22:
+                parts.append(json.loads(b'"' + bytes(buf[:cut]) + b'"'))
+                del buf[:cut + 1]
+                text = "".join(parts)
+                if split_pair:
+                    text = text.encode("utf-16", "surrogatepass")
+                    text = text.decode("utf-16", "surrogatepass")
+                return text
+            if len(buf) - cut >= 6:  # not cut off but malformed: "\\uZZZZ"
+                json.loads(b'"' + bytes(buf[cut:cut + 6]) + b'"')
+            # Hold back a UTF-8 character the chunk end may have split.
+            for _ in range(3):
+                if cut and buf[cut - 1] & 0xC0 == 0x80:
+                    cut -= 1
+            if cut and buf[cut - 1] >= 0xC0:
+                cut -= 1
+            if cut:
+                parts.append(json.loads(b'"' + bytes(buf[:cut]) + b'"'))
+                split_pair |= "\ud800" <= parts[-1][-1:] <= "\udbff"  # \uD83D|\uDE00
+                del buf[:cut]
+            if not more():
+                raise ValueError("unterminated string")
+
+    first = skip_ws()
+    if first is None:
+        return {}
+    if first != ord("{"):
+        raise ValueError("body is not a JSON object")
+    del buf[:1]
+    data: dict = {}
+    while True:
+        byte = skip_ws()
+        if byte == ord("}"):
+            return data
+        if data:
+            if byte != ord(","):
+                raise ValueError("expected ',' or '}'")
+            del buf[:1]
+            byte = skip_ws()
+        if byte != ord('"'):
+            raise ValueError("expected a member name")
+        key = value()
+        if skip_ws() != ord(":"):
+            raise ValueError("expected ':'")
+        del buf[:1]
+        if skip_ws() == ord('"') and key == "text":
+            del buf[:1]
+            data[key] = string()
+        else:
+            data[key] = value()
+
+
+def _spool(chunks: "Iterator[bytes]"):
+    """The whole body in a temporary file (in memory up to MAX_BODY_BYTES).
+    Read before any reply is written: a client that uploads all of a long
+    batch before reading would otherwise deadlock with the results."""
+    spool = tempfile.SpooledTemporaryFile(max_size=MAX_BODY_BYTES)
+    try:
+        for chunk in chunks:
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def _spooled_lines(spool) -> "Iterator[bytes]":
+    """Lines of a `_spool`.  One over MAX_BODY_BYTES is skipped without
+    being held and comes back as a NUL byte: not JSON, so its result is an
+    error line."""
+    with spool:
+        while True:
+            line = spool.readline(MAX_BODY_BYTES + 1)
+            if not line:
+                return
+            if len(line) > MAX_BODY_BYTES:
+                while line and not line.endswith(b"\n"):
+                    line = spool.readline(READ_CHUNK_BYTES)
+                line = b"\0"
+            yield line
+
+
+class handler(BaseHTTPRequestHandler):
+    # Persistent connections: every reply carries a Content-Length or is
+    # chunked, so a client can send its next poll on the same socket.
+    protocol_version = "HTTP/1.1"
+    timeout = KEEPALIVE_TIMEOUT_S
+
+    def _set_cors(self):
+        # Allow all origins for local development; tighten in prod if needed
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Headers",
+                         "Content-Type, Content-Encoding, Accept, X-Request-ID, If-None-Match, Prefer")
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+        self.send_header("Access-Control-Expose-Headers",
+                         "X-Request-ID, ETag, Location, X-Mindmap-Stale, X-Mindmap-Local")
+
+    def _start_trace(self) -> None:
+        """Adopt the caller's X-Request-ID (or mint one) for logs/headers."""
+        self.trace_id = self.headers.get("x-request-id") or uuid.uuid4().hex[:12]
+        _TRACE_ID.set(self.trace_id)
+        _STALE.set(False)
+        _LOCAL.set("")
+
+    def _send(self, code: int, payload: bytes, content_type: str, headers: "dict | None" = None):
+        METRICS.inc("mindmap_responses_total", code=code)
+        encoding = None
+        if len(payload) >= COMPRESS_MIN_BYTES:
+            encoding = _negotiate_encoding(self.headers.get("accept-encoding", ""))
+        if encoding:
+            with METRICS.stage("compress"):
+                payload = _encode(payload, encoding)
+        self.send_response(code)
+        self._set_cors()
+        self.send_header("Content-Type", content_type)
+        self.send_header("X-Request-ID", getattr(self, "trace_id", ""))
+        self.send_header("Vary", "Accept-Encoding")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if code != 304:
+            self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _json(self, code: int, obj, headers: "dict | None" = None):
+        # Models (and dicts/lists of them) go straight to bytes in
+        # pydantic-core: no model_dump() dict, no intermediate str.
+        with METRICS.stage("serialize"):
+            payload = to_json(obj)
+        self._send(code, payload, "application/json", headers)
+
+    def _stream(self, events, sse: bool, meeting_id: str | None = None):
+        """Write `build_map_stream` events as NDJSON lines or SSE frames.
+
+        Each line / frame is `{"type": "draft"|"node"|"edge"|"done"|"error",
+        "data": …}`; "draft" is a whole local-engine map to show meanwhile;
+        "done" carries the final node and edge counts (and graph version for
+        meetings), plus the whole "map" when repairs made it differ from
+        what was streamed.  HTTP/1.1 clients get a chunked body and keep
+        their connection; HTTP/1.0 ones read until close."""
+        write = self._open_stream("text/event-stream" if sse else "application/x-ndjson")
+        streamed: "dict[str, list]" = {"node": [], "edge": []}
+
+        def emit(kind: str, data) -> None:
+            line = to_json({"type": kind, "data": data})
+            write(b"event: %s\ndata: %s\n\n" % (kind.encode(), line) if sse else line + b"\n")
+
+        try:
+            for kind, item in events:
+                if kind == "map":
+                    done = {"nodes": len(item.nodes), "edges": len(item.edges)}
+                    if meeting_id:
+                        done["version"], _ = publish_map(meeting_id, item)
+                    # repair_map may have dropped or rewritten streamed elements
+                    if streamed["node"] != item.nodes or streamed["edge"] != item.edges:
+                        done["map"] = item
+                    emit("done", done)
+                else:
+                    streamed.get(kind, []).append(item)
+                    emit(kind, item)
+        except Exception as err:
+            METRICS.inc("mindmap_errors_total", kind=type(err).__name__)
+            _log("❌  backend error:", err)
+            emit("error", {"error": "Mind-map generation failed"})
+        write(b"")
+
+    def _open_stream(self, content_type: str):
+        """Send 200 headers for a body written piece by piece and return
+        `write(bytes)`; `write(b"")` ends the body."""
+        chunked = self.request_version == "HTTP/1.1"
+        METRICS.inc("mindmap_responses_total", code=200)
+        self.send_response(200)
+        self._set_cors()
+        self.send_header("Content-Type", content_type)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("X-Request-ID", self.trace_id)
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        else:
+            self.close_connection = True
+        self.end_headers()
+
+        def write(data: bytes) -> None:
+            if chunked:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data) if data else b"0\r\n\r\n")
+            elif data:
+                self.wfile.write(data)
+            self.wfile.flush()
+
+        return write
+
+    # Handle CORS pre-flight
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self._set_cors()
+        self.send_header("Access-Control-Max-Age", "86400")
+        self.end_headers()
+
+    def do_GET(self):
+        self._start_trace()
+        url = urlsplit(self.path)
+        path = url.path.rstrip("/")
+        if path.endswith("/metrics"):
+            self._send(200, METRICS.render().encode(), "text/plain; version=0.0.4")
+        elif path.endswith("/push"):
+            self._push(parse_qs(url.query))
+        elif path.endswith("/search"):
+            self._search(parse_qs(url.query))
+        elif "/jobs/" in path:
+            try:
+                wait_s = float(parse_qs(url.query).get("wait", ["0"])[0])
+            except ValueError:
+                wait_s = 0
+            job = open_job_queue().get(path.rsplit("/", 1)[1], min(max(wait_s, 0), JOB_MAX_WAIT_S))
+            if job is None:
+                self._json(404, {"error": "Unknown job"})
+            else:
+                self._json(200 if job["status"] in ("done", "failed") else 202, job)
+        else:
+            self._json(404, {"error": "Not found"})
+
+    def _search(self, query: dict) -> None:
+        """Where a meeting discussed something (see "Segment index")."""
+        meeting_id, q, node_id = ((query.get(k) or [""])[0].strip()
+                                  for k in ("meeting_id", "q", "node"))
+        with METRICS.stage("search"):
+            index = segment_index(meeting_id) if meeting_id else None
+            if index is None:
+                self._json(404, {"error": "Unknown meeting"})
+                return
+            with _GRAPHS_LOCK:
+                graph = _GRAPHS.get(meeting_id) or _MeetingGraph()
+            if q:
+                passages = index.search(q)
+                body = {"query": q, "segments": passages,
+                        "nodes": index.related(graph, q, passages)}
+            elif node_id:
+                node = graph.nodes.get(node_id)
+                if node is None:
+                    self._json(404, {"error": "Unknown node"})
+                    return
+                body = {"node": node, "segments": index.links(graph)[node_id]}
+            else:
+                body = {"version": graph.version, "nodes": index.links(graph)}
+        self._json(200, body)
+
+    def _push(self, query: dict) -> None:
+        """Upgrade to a WebSocket and run push ingestion on it."""
+        key = self.headers.get("sec-websocket-key", "")
+        meeting_id = (query.get("meeting_id") or [""])[0].strip()
+        if self.headers.get("upgrade", "").lower() != "websocket" or not key:
+            self._json(426, {"error": "WebSocket upgrade required"}, {"Upgrade": "websocket"})
+            return
+        if not meeting_id:
+            self._json(400, {"error": "meeting_id is required"})
+            return
+        since = (query.get("since") or [""])[0]
+        accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode()).digest()).decode()
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+        self.connection.settimeout(PUSH_IDLE_TIMEOUT_S)
+
+        socket = _WebSocket(self.rfile, self.wfile)
+        ingest = _PushIngest(meeting_id, socket, int(since) if since.isdigit() else None)
+        worker = threading.Thread(target=copy_context().run, args=(ingest.run,),
+                                  name=f"push-{self.trace_id}", daemon=True)
+        METRICS.add_gauge("mindmap_push_connections", 1)
+        worker.start()
+        try:
+            for raw in socket.messages():
+                message = json.loads(raw)
+                if not isinstance(message, dict):
+                    continue
+                if message.get("type") == "append" and isinstance(message.get("text"), str):
+                    ingest.append(message["text"])
+                elif message.get("type") == "final":
+                    ingest.finish()
+        except (OSError, ValueError) as err:  # gone, timed out, bad frame / JSON
+            _log(f"🔌 push connection ended: {type(err).__name__}: {err}")
+        finally:
+            ingest.close()
+            worker.join()  # a final pass still lands in the session and cache
+            METRICS.add_gauge("mindmap_push_connections", -1)
+
+    def do_POST(self):
+        self._start_trace()
+        METRICS.add_gauge("mindmap_inflight_requests", 1)
+        try:
+            self._handle_post()
+        finally:
+            METRICS.add_gauge("mindmap_inflight_requests", -1)
+
+    def _handle_post(self):
+        # 1️⃣  Read the body in bounded chunks (could be 0 bytes); only the
+        # transcript itself is ever held whole
+        batch = urlsplit(self.path).path.rstrip("/").endswith("/batch")
+        try:
+            with METRICS.stage("read"):
+                if batch:
+                    spool = _spool(_body_chunks(self.rfile, self.headers, MAX_BATCH_BODY_BYTES))
+                else:
+                    data = _read_json_object(_body_chunks(self.rfile, self.headers))
+        except PayloadTooLarge as err:
+            METRICS.inc("mindmap_bodies_rejected_total")
+            # The rest of the body is never read: the connection can't be reused.
+            self._json(413, {"error": f"Request body too large: {err}"}, {"Connection": "close"})
+            return
+        except ValueError as err:  # bad JSON / encoding / framing
+            self._json(400, {"error": f"Bad request body: {err}"}, {"Connection": "close"})
+            return
+        if batch:
+            # NDJSON in, NDJSON out: one result line per transcript, in
+            # completion order, while the rest are still being mapped.
+            write = self._open_stream("application/x-ndjson")
+            for result in build_batch(_ndjson_items(_spooled_lines(spool))):
+                write(to_json(result) + b"\n")
+            write(b"")
+            return
+        if not isinstance(data.get("text"), (str, type(None))):
+            self._json(400, {"error": "'text' must be a string"})
+            return
+        text = (data.get("text") or "").strip()
+        meeting_id = str(data.get("meeting_id") or "").strip() or None
+        final = data.get("final") is True  # last pass of a meeting: quality tier
+        accept = self.headers.get("accept", "")
+        sse = "text/event-stream" in accept
+        stream = bool(data.get("stream")) or sse or "application/x-ndjson" in accept
+
+        # Empty transcript → just return an empty map; no exceptions.
+        if not text:
+            _log("ℹ️  empty transcript")
+            self._json(200, {"nodes": [], "edges": []})
+            return
+
+        if data.get("async") is True or "respond-async" in self.headers.get("prefer", ""):
+            job_id = open_job_queue().submit(
+                {"text": text, "meeting_id": meeting_id, "final": final})
+            location = f"{urlsplit(self.path).path.rstrip('/')}/jobs/{job_id}"
+            self._json(202, {"job_id": job_id, "status": "queued"}, {"Location": location})
+            return
+
+        deadline_s = REQUEST_DEADLINE_S
+        if isinstance(data.get("deadline_ms"), (int, float)) and data["deadline_ms"] > 0:
+            deadline_s = min(data["deadline_ms"] / 1000, REQUEST_DEADLINE_S)
+
+        if stream:
+            self._stream(build_map_stream(text, meeting_id, deadline_s), sse, meeting_id)
+            return
+
+        # 2️⃣  Call GPT
+        try:
+            with METRICS.stage("build"):
+                result = build_map(text, meeting_id, deadline_s, final)
+            flags = {"X-Mindmap-Stale": "1"} if _STALE.get() else {}
+            if _LOCAL.get():
+                flags["X-Mindmap-Local"] = _LOCAL.get()
+            if not meeting_id:
+                self._json(200, result, flags)
+                return
+            # 3️⃣  Versioned reply: 304, a delta, or the full map
+            since = data.get("since")
+            since = since if isinstance(since, int) else None
+            version, reply = publish_map(meeting_id, result, since)
+            etag = f'"{version}"'
+            if not reply or self.headers.get("if-none-match") == etag:
+                self._send(304, b"", "application/json", {"ETag": etag, **flags})
+            else:
+                self._json(200, reply, {"ETag": etag, **flags})
+        except DeadlineExceeded as err:
+            _log("⌛ ", err)
+            self._json(504, {"error": "Mind-map generation timed out"})
+        except CircuitOpenError as err:
+            self._json(503, {"error": "Mind-map generation temporarily unavailable"},
+                       {"Retry-After": str(err.retry_after)})
+        except Exception as err:
+            METRICS.inc("mindmap_errors_total", kind=type(err).__name__)
+            _log("❌  backend error:", err)
+            self._json(500, {"error": "Mind-map generation failed"})
+
+
+# ──────────────────────── Cold start ───────────────────────
+# Importing this module only defines things; the OpenAI client, `openai`
+# itself, the tokenizer and the sample transcript are all loaded on first
+# use.  `warmup()` pays those costs ahead of the first request instead:
+# long-running servers call it at start-up, and MINDMAP_WARMUP=1 runs it in
+# a background thread at import so it overlaps a serverless cold start.
+
+_WARMUP_MAP = (
+    '{"nodes":[{"id":"m","label":"Warm Up","importance":5},{"id":"t","label":"Topic"}],'
+    '"edges":[{"source":"m","target":"t"}]}'
+)
+
+
+def warmup() -> None:
+    start = time.perf_counter()
+    _client()
+    count_tokens("warm up")
+    to_json(repair_map(MindMap.model_validate_json(_WARMUP_MAP)))
+    _log(f"🔥 warmed up in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+if os.getenv("MINDMAP_WARMUP") == "1":
+    threading.Thread(target=warmup, name="warmup", daemon=True).start()
 
 
 # ─────────────────────── Local test ───────────────────────
 
 
 if __name__ == "__main__":
-    transcript = sys.stdin.read()
-    print(build_map(transcript).model_dump_json(indent=2))
-
-# The YouTube transcript you pasted.  Keep it verbatim so GPT has full context.
-SAMPLE_TRANSCRIPT = """
-00:00:00.640
-two days ago i put together a video
-00:00:03.040
-listing out my training priorities and
-00:00:05.680
-probably what your training priorities
-00:00:07.839
-should be in terms of bag work sparring
-00:00:10.719
-shadow boxing skipping what is the most
-00:00:13.120
-important and where should you put your
-00:00:14.719
-focus but then i had a couple comments
-00:00:17.680
-people saying you should do this same
-00:00:19.520
-list but for beginners so today is a
-00:00:22.880
-training priority list for those people
-00:00:25.920
-looking to learn any striking style
-00:00:29.039
-could be kickboxing could be muay thai
-00:00:31.519
-could be karate we're going to break
-00:00:33.280
-down what you should be prioritizing and
-00:00:36.000
-what is the least important thing that
-00:00:37.840
-you don't need to worry about until you
-00:00:39.440
-get more to that intermediate level
-00:00:42.740
-[Music]
-00:00:52.960
-so me making a video called the most
-00:00:55.440
-important training priorities and not
-00:00:57.680
-really differentiating that this was
-00:00:59.760
-more for people who had an established
-00:01:01.840
-base in martial arts it's kind of my
-00:01:03.920
-fault i should have said this is for the
-00:01:05.680
-intermediate advanced guys and then i'll
-00:01:07.600
-follow up with a video like we're doing
-00:01:09.280
-today for the people who are beginners
-00:01:11.360
-because you don't want to be making the
-00:01:12.799
-mistake of prioritizing things that you
-00:01:15.759
-shouldn't even be moving on to yet for
-00:01:17.840
-example i listed pad work is number one
-00:01:21.040
-running is priority number two and
-00:01:23.439
-sparring is priority number three but
-00:01:25.520
-you don't really need to worry about any
-00:01:26.960
-of that until your skill level builds so
-00:01:29.439
-let's start off and move on to priority
-00:01:32.079
-number eight and we will work our way
-00:01:34.479
-from the least important all the way up
-00:01:37.119
-to the most important i gotta do that
-00:01:39.119
-work from bottom to top just to keep
-00:01:41.200
-everybody entertained and make sure you
-00:01:43.119
-guys don't just get point number one and
-00:01:45.040
-then skip out on the rest of the video
-00:01:46.560
-because it's important to have
-00:01:48.079
-everything properly listed out so
-00:01:50.560
-priority number eight
-00:01:52.399
-in my opinion is pad work and like i
-00:01:55.360
-said i listed this as the number one
-00:01:57.600
-most important thing that i would not be
-00:01:59.439
-willing to give up in my training camp
-00:02:01.840
-but as you are starting off it's not as
-00:02:04.719
-important as everything else we're gonna
-00:02:06.399
-list above because for me as i mentioned
-00:02:09.199
-pad work is that time where i can get a
-00:02:11.920
-simulation of hard sparring i can work
-00:02:14.400
-on my technique i can work on my defense
-00:02:17.360
-everything is together with a good pad
-00:02:20.319
-holder but you want to break things down
-00:02:22.800
-individually
-00:02:24.239
-when you are learning so pad work is not
-00:02:26.560
-something that you have to be focused on
-00:02:28.480
-even though it is absolutely one of the
-00:02:30.400
-most fun things you can do in the gym
-00:02:32.480
-priority number seven is to get your
-00:02:34.959
-clench work on point and we want to make
-00:02:37.840
-sure that clench work is coming along
-00:02:40.000
-because it doesn't matter if you're
-00:02:41.040
-doing mma
-00:02:42.480
-kickboxing muay thai the inside fight
-00:02:45.680
-game is neglected by many people and is
-00:02:48.080
-so darn important but there are other
-00:02:51.519
-things which are more important which we
-00:02:53.599
-will get to but you still want to make
-00:02:55.519
-sure this is added in keep in mind there
-00:02:57.599
-are some things that are so low on the
-00:03:00.080
-priority list that i didn't even list
-00:03:01.519
-them i just put down eight things which
-00:03:03.440
-you should be working on and kind of
-00:03:05.120
-ignored everything else things that you
-00:03:07.280
-don't even need to think about at this
-00:03:09.040
-moment but remember that clench work is
-00:03:11.280
-absolutely something you want to add in
-00:03:13.440
-and if it doesn't come around on your
-00:03:15.280
-first second third week of training
-00:03:17.599
-that's fine even if it takes a couple
-00:03:19.280
-months you will get there eventually but
-00:03:21.680
-don't let yourself wait for a super long
-00:03:24.720
-time because eventually you will want to
-00:03:26.480
-get this aspect of martial arts down pat
-00:03:30.000
-now next up i want to talk about
-00:03:31.519
-calisthenics
-00:03:32.959
-obviously
-00:03:34.319
-cardio is a massive massive part of
-00:03:36.720
-fight sports but you don't need to head
-00:03:38.480
-out and start doing the road work early
-00:03:40.000
-on because the cardio will come and you
-00:03:42.319
-can improve it but you do want to start
-00:03:45.440
-building your body strength especially
-00:03:47.840
-if you're a beginner how do we go about
-00:03:49.360
-doing that well we use calisthenics like
-00:03:52.080
-push-ups sit-ups squats body weight
-00:03:55.280
-exercises that are going to make you
-00:03:56.959
-that much stronger and help improve your
-00:03:58.959
-cardio so when you eventually do get to
-00:04:01.200
-that intermediate stage and start adding
-00:04:03.519
-in the running and the road work you're
-00:04:05.840
-not feeling out of your depth and your
-00:04:07.599
-cardio is already pretty high easy way
-00:04:10.480
-to add in these type of motions and to
-00:04:12.319
-challenge your heart rate is to do
-00:04:13.840
-something like circuits maybe you do
-00:04:15.680
-something like 30 seconds of push-ups 30
-00:04:18.079
-seconds of sit-ups 30 seconds of burpees
-00:04:20.798
-maybe 30 seconds of straight punches you
-00:04:23.280
-do that as fast as you can for two
-00:04:24.880
-minutes you take a one-minute break and
-00:04:26.479
-you repeat three times
-00:04:28.400
-exercises like this are very important
-00:04:30.800
-and they're going to benefit you as you
-00:04:32.400
-move forward in your martial arts career
-00:04:35.120
-or journey next up we are talking about
-00:04:37.759
-defense how do we deal with shots coming
-00:04:40.479
-at us and obviously it's not a priority
-00:04:43.919
-but we're not going to prioritize the
-00:04:45.360
-defense over the offense because the
-00:04:47.120
-very first thing is to get down all that
-00:04:49.680
-offense but the defense comes along very
-00:04:52.000
-quickly and you do not want to forget
-00:04:53.680
-about it in the beginner stages and i
-00:04:56.240
-preach on this channel so often that
-00:04:58.960
-many gyms do not spend enough time on
-00:05:01.840
-defense so if your instructor is not
-00:05:04.400
-taking time to teach you defense and
-00:05:06.240
-actually drill it grab somebody after
-00:05:08.560
-class and tell them throw a jab at me 10
-00:05:11.360
-times and you're going to work block
-00:05:13.120
-block all the different ways that you
-00:05:15.199
-might evade that jab and then have them
-00:05:17.280
-throw a round kick and then have them
-00:05:18.639
-throw the front kick you have to
-00:05:20.560
-prioritize the defense and make sure you
-00:05:22.800
-are learning it so that when we do
-00:05:24.720
-eventually get to sparring which isn't
-00:05:26.720
-even on this list sparring should not be
-00:05:28.639
-on the list because you're learning so
-00:05:30.320
-many other things first but when you do
-00:05:32.080
-get to your first sparring session you
-00:05:34.080
-have had time to practice your defense
-00:05:36.800
-next up and priority number four we are
-00:05:39.520
-talking about bag work i do not love bad
-00:05:43.199
-work myself and when i listed out my
-00:05:45.919
-training priorities it was way down low
-00:05:48.800
-but for somebody who is starting off bag
-00:05:51.280
-work is super important because as
-00:05:54.160
-opposed to pad work where somebody else
-00:05:55.919
-is rushing you telling you what to do on
-00:05:58.240
-bag work you can take your time you can
-00:06:00.560
-slow down and you're going to be
-00:06:02.639
-learning about hitting something solid
-00:06:04.560
-and making sure every bit of your
-00:06:06.880
-technique is correct if i throw my hook
-00:06:08.720
-like this i'm safe if i throw my hook
-00:06:11.360
-like that i'm going to probably end up
-00:06:13.600
-injuring something the wrist being the
-00:06:16.080
-part that's at risk the most right now
-00:06:18.319
-so the bag work is going to be a time to
-00:06:20.319
-keep you very honest in the quality of
-00:06:22.639
-your technique and you can slow things
-00:06:25.039
-down create your own combos in your mind
-00:06:27.680
-and let them go on the bag and in
-00:06:30.160
-addition as you're doing your bag work
-00:06:31.919
-you can work your defense which we
-00:06:34.000
-already talked about which was listed
-00:06:35.840
-just one below number four of bag work
-00:06:39.199
-now we're moving into the top three
-00:06:40.960
-priorities the very important ones if
-00:06:43.440
-you are starting off and we are focusing
-00:06:46.319
-now on footwork and in addition to
-00:06:50.080
-learning your footwork you can also say
-00:06:52.400
-that skipping is footwork as well so i
-00:06:55.360
-listed skipping super low super low down
-00:06:58.240
-i think it was like the last one number
-00:06:59.919
-10 on my list but as a beginner grabbing
-00:07:03.120
-the rope and learning to bounce around
-00:07:04.960
-and just get that movement in place is
-00:07:07.039
-great in addition to that you also want
-00:07:09.440
-to be practicing pushing backwards
-00:07:12.000
-forwards cutting off on angles using all
-00:07:15.120
-that together but skipping is a
-00:07:16.880
-fantastic way to start your footwork and
-00:07:19.120
-then in addition you can start
-00:07:20.880
-practicing moving forward and back in
-00:07:23.199
-your bag work and all those other
-00:07:24.639
-aspects but you do not want to be a
-00:07:26.560
-stationary target you don't want to be
-00:07:28.240
-somebody when you start sparring who is
-00:07:30.639
-just in one place and you only have your
-00:07:33.280
-offense and your defense but you forget
-00:07:35.599
-about the movement aspect so make sure
-00:07:38.479
-you add in your footwork very early on
-00:07:41.599
-definitely in the top three in the
-00:07:43.440
-priority list for me next up number two
-00:07:46.720
-on the priority list and something that
-00:07:48.319
-i put down again very low in my personal
-00:07:51.199
-training priorities as i get ready for a
-00:07:53.120
-fight is shadow boxing shadow boxing is
-00:07:56.560
-going to be so darn important because
-00:07:59.520
-unlike bag work you can throw
-00:08:02.400
-but not damage yourself you're not going
-00:08:04.080
-to hurt your fists your wrists your foot
-00:08:06.960
-your shins when you are shadow boxing
-00:08:09.440
-you can take your time throw everything
-00:08:12.000
-nice and fluid come back set your feet
-00:08:15.039
-on the ground work on some footwork work
-00:08:17.120
-on some defense you can put everything
-00:08:19.039
-together in shadow boxing at a pace that
-00:08:22.240
-you are comfortable with that is why
-00:08:24.400
-this is such an important aspect of
-00:08:28.080
-learning a martial art and really just
-00:08:30.319
-getting comfortable with the motions and
-00:08:32.958
-the final most important thing
-00:08:36.000
-in priority list when you are learning a
-00:08:38.000
-martial art is to get down the technique
-00:08:41.279
-and we are talking here strictly about
-00:08:43.760
-offense now i actually have a video
-00:08:46.320
-which is perfect for anybody out there
-00:08:47.839
-who is brand new you can follow along
-00:08:49.519
-it's a full-length 40 minute follow
-00:08:51.680
-along beginner tutorial on striking
-00:08:54.160
-technique perfect for anybody out there
-00:08:56.480
-but just keep in mind that the best
-00:08:58.560
-thing you can do on your first day is
-00:09:00.160
-just get into your stance boom boom
-00:09:02.880
-and you just run through the technique
-00:09:04.880
-you run through it until you feel really
-00:09:06.800
-comfortable then maybe you go through
-00:09:08.399
-your kick over and over and over and
-00:09:10.800
-then we work our way down in the list
-00:09:12.720
-once you have your technique down then
-00:09:14.399
-you move to the shadow boxing which we
-00:09:16.000
-mentioned then you can start working
-00:09:17.920
-your footwork after and then when you're
-00:09:19.680
-feeling good on all that you start
-00:09:21.279
-adding in bag work because you want to
-00:09:23.120
-start getting used to hitting something
-00:09:24.880
-solid work your way backwards once you
-00:09:27.519
-get the striking technique down very
-00:09:30.560
-important when you are a beginner in
-00:09:32.399
-martial arts to follow this list you
-00:09:34.399
-might not agree with me 100 you might
-00:09:36.720
-have other priorities you might want to
-00:09:38.640
-shuffle them a little bit but overall
-00:09:41.040
-this is sort of your bread and butter on
-00:09:42.880
-how to get better as fast as possible
-00:09:45.680
-you do not want to run in and start
-00:09:47.600
-doing long distance run or going and
-00:09:50.000
-focusing on sparring or trying to do
-00:09:52.320
-really hard pad work on your first days
-00:09:54.240
-you're going to make too many mistakes
-00:09:55.600
-and it's going to slow down your overall
-00:09:57.760
-progress of getting very good very fast
-00:10:01.519
-and that is my training priority list
-00:10:04.320
-for beginners if you know somebody out
-00:10:06.399
-there who would benefit from watching
-00:10:08.079
-this video please make sure you share it
-00:10:09.760
-with them if you enjoyed the video give
-00:10:11.279
-it a like if you haven't already join
-00:10:13.040
-the channel get subscribed for lots of
-00:10:15.279
-other videos coming at you daily and as
-00:10:17.920
-always guys train hard and i will see
-00:10:19.680
-you back here soon for another video
-""".strip()
+    if sys.argv[1:2] == ["batch"]:
+        _batch_cli(sys.argv[2:])
+    else:
+        transcript = sys.stdin.read()
+        print(build_map(transcript).model_dump_json(indent=2))
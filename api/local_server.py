@@ -1,8 +1,182 @@
 # api/local_server.py
+import argparse
+import selectors
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from http.server import HTTPServer
-from backend import handler           # ← the class you already have
+from backend import KEEPALIVE_TIMEOUT_S, handler, open_job_queue, warmup  # ← the class you already have
+
+
+class PooledHTTPServer(HTTPServer):
+    """`HTTPServer` that serves requests on a fixed worker pool.
+
+    At most `workers` requests run at once and at most `queue` more wait for
+    a free worker.  Anything beyond that is answered straight away with
+    503 + Retry-After instead of piling up on the listen socket, so one slow
+    OpenAI call can no longer block every other client.
+
+    A connection only holds a worker while a request is on it.  Between
+    requests (and before the first) it waits on a selector, so idle
+    keep-alive connections, one per open tab, cost a file descriptor rather
+    than a worker; they are closed after `idle_timeout` seconds.
+    """
+
+    def __init__(self, address, handler_class, workers=16, queue=64, retry_after=2,
+                 idle_timeout=KEEPALIVE_TIMEOUT_S):
+        super().__init__(address, handler_class)
+        self.retry_after = retry_after
+        self.idle_timeout = idle_timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        # Rejections are cheap but must not run on the accept loop.
+        self._rejecter = ThreadPoolExecutor(max_workers=2, thread_name_prefix="api-503")
+        # Idle connections: parked by any thread, watched by one.
+        self._idle = selectors.DefaultSelector()
+        self._parking = []
+        self._parking_lock = threading.Lock()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._idle.register(self._wake_r, selectors.EVENT_READ)
+        self._closing = False
+        self._watcher = threading.Thread(target=self._watch_idle, name="api-idle", daemon=True)
+        self._watcher.start()
+
+    def process_request(self, request, client_address):
+        # Like BaseRequestHandler.__init__ minus handle(): the handler lives
+        # as long as the connection and serves one request per dispatch.
+        conn = self.RequestHandlerClass.__new__(self.RequestHandlerClass)
+        conn.request, conn.client_address, conn.server = request, client_address, self
+        conn.close_connection = True
+        conn.setup()
+        self._park(conn)
+
+    def _dispatch(self, conn):
+        if not self._slots.acquire(blocking=False):
+            self._rejecter.submit(self._reject, conn)
+            return
+        self._pool.submit(self._work, conn)
+
+    def _work(self, conn):
+        keep = False
+        try:
+            conn.handle_one_request()
+            keep = not conn.close_connection
+        except Exception:
+            self.handle_error(conn.request, conn.client_address)
+        finally:
+            self._slots.release()
+        if not keep:
+            self._close(conn)
+        elif self._buffered(conn):
+            self._dispatch(conn)  # pipelined: the next request is already read
+        else:
+            self._park(conn)
+
+    @staticmethod
+    def _buffered(conn) -> bool:
+        """Whether bytes of the next request already sit in `conn.rfile`
+        (the selector only sees the socket)."""
+        conn.connection.settimeout(0)
+        try:
+            return bool(conn.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            conn.connection.settimeout(conn.timeout)
+
+    def _park(self, conn):
+        with self._parking_lock:
+            self._parking.append(conn)
+        self._wake_w.send(b"\0")
+
+    def _watch_idle(self):
+        """Hand readable connections to the pool; close ones idle too long."""
+        swept = time.monotonic()
+        while not self._closing:
+            events = self._idle.select(timeout=1)
+            now = time.monotonic()
+            with self._parking_lock:
+                parking, self._parking = self._parking, []
+            for conn in parking:
+                self._idle.register(conn.connection, selectors.EVENT_READ, (conn, now))
+            for key, _ in events:
+                if key.fileobj is self._wake_r:
+                    self._wake_r.recv(4096)
+                    continue
+                self._idle.unregister(key.fileobj)
+                self._dispatch(key.data[0])
+            if now - swept >= 1:
+                swept = now
+                for key in list(self._idle.get_map().values()):
+                    if key.data and now - key.data[1] > self.idle_timeout:
+                        self._idle.unregister(key.fileobj)
+                        self._close(key.data[0])
+
+    def _close(self, conn):
+        try:
+            conn.finish()
+        except OSError:
+            pass
+        self.shutdown_request(conn.request)
+
+    def _reject(self, conn):
+        try:
+            conn.finish()
+        except OSError:
+            pass
+        request = conn.request
+        body = b'{"error": "Server busy, retry shortly"}'
+        head = (
+            "HTTP/1.1 503 Service Unavailable\r\n"
+            f"Retry-After: {self.retry_after}\r\n"
+            "Access-Control-Allow-Origin: *\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        try:
+            request.settimeout(1)
+            request.sendall(head.encode() + body)
+            # Drain what the client is still sending; closing with unread
+            # bytes would RST the connection before it sees the 503.
+            request.shutdown(socket.SHUT_WR)
+            while request.recv(65536):
+                pass
+        except OSError:
+            pass
+        finally:
+            self.close_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._closing = True
+        self._wake_w.send(b"\0")
+        self._watcher.join()
+        for key in list(self._idle.get_map().values()):
+            if key.data:
+                self._close(key.data[0])
+        for conn in self._parking:
+            self._close(conn)
+        self._idle.close()
+        self._wake_r.close()
+        self._wake_w.close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._rejecter.shutdown(wait=False, cancel_futures=True)
+
 
 if __name__ == "__main__":
-    port = 5001
-    print(f"🔌 local API on http://localhost:{port}/api/backend")
-    HTTPServer(("0.0.0.0", port), handler).serve_forever()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Local mind-map API server")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--workers", type=int, default=16,
+                        help="requests handled concurrently (each open push connection holds one)")
+    parser.add_argument("--queue", type=int, default=64,
+                        help="requests allowed to wait for a worker before 503")
+    args = parser.parse_args()
+
+    open_job_queue()  # resume jobs queued before the last shutdown
+    warmup()          # first request should not pay for imports and clients
+    print(f"🔌 local API on http://localhost:{args.port}/api/backend "
+          f"({args.workers} workers, queue {args.queue})")
+    PooledHTTPServer(("0.0.0.0", args.port), handler,
+                     workers=args.workers, queue=args.queue).serve_forever()
@@ -0,0 +1,112 @@
+"""Concurrent `build_map_async` calls against the fake completion server.
+
+    python bench/bench_async.py --requests 200 --latency 0.5 [--deadline 10] [--sync]
+
+`fake_openai.serve()` answers every completion after `--latency` seconds
+over real HTTP, and `OPENAI_BASE_URL` points the backend's clients at it.
+`--requests` distinct transcripts (half small, half large, so both model
+tiers are routed to) are mapped at once with `asyncio.gather`; `--sync`
+adds the same load through `build_map` on a thread pool of
+`--threads` for comparison.  Reported per phase: wall time, maps/s,
+latency percentiles and deadline misses.  The result caches are disabled.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import os
+import statistics
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "api"))
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+import backend  # noqa: E402
+from fake_openai import serve  # noqa: E402
+
+
+def _transcripts(count: int) -> list:
+    sample = backend.SAMPLE_TRANSCRIPT
+    sizes = [1_000, 12_000]
+    return [uuid.uuid4().hex + " " + (sample * (sizes[i % 2] // len(sample) + 1))[:sizes[i % 2]]
+            for i in range(count)]
+
+
+def report(label: str, elapsed: float, times: list, misses: int) -> None:
+    ordered = sorted(times) or [0.0]
+    print(f"{label:<8} {len(times) + misses:>6} {elapsed:>8.2f}s {len(times) / elapsed:>8.1f}/s "
+          f"{statistics.median(ordered) * 1000:>8.0f}ms "
+          f"{ordered[int(0.95 * (len(ordered) - 1))] * 1000:>8.0f}ms {misses:>7}")
+
+
+async def run_async(texts: list, deadline_s: float) -> None:
+    times, misses = [], 0
+
+    async def one(text: str) -> None:
+        nonlocal misses
+        start = time.perf_counter()
+        try:
+            await backend.build_map_async(text, deadline_s=deadline_s)
+        except backend.DeadlineExceeded:
+            misses += 1
+            return
+        times.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(text) for text in texts))
+    report("async", time.perf_counter() - start, times, misses)
+    await backend.close_async_client()
+
+
+def run_sync(texts: list, deadline_s: float, threads: int) -> None:
+    times, misses = [], [0]
+
+    def one(text: str) -> None:
+        start = time.perf_counter()
+        try:
+            backend.build_map(text, deadline_s=deadline_s)
+        except backend.DeadlineExceeded:
+            misses[0] += 1
+            return
+        times.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, texts))
+    report("sync", time.perf_counter() - start, times, misses[0])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per completion")
+    parser.add_argument("--deadline", type=float, default=10, help="per-request deadline (s)")
+    parser.add_argument("--sync", action="store_true", help="also run build_map on threads")
+    parser.add_argument("--threads", type=int, default=16, help="threads for --sync")
+    args = parser.parse_args()
+
+    server = serve(latency=args.latency)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    backend._CACHE = backend._ResultCache(max_entries=0, ttl_s=0)
+    backend.NEAR_DUP = False
+    backend.TIER_PRIOR_S = {tier: args.latency for tier in backend.MODEL_TIERS}
+    backend.LOCAL_FALLBACK = False  # count misses instead of serving local maps
+
+    print(f"{'phase':<8} {'reqs':>6} {'wall':>9} {'rate':>10} {'p50':>10} {'p95':>10} {'missed':>7}")
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+        asyncio.run(run_async(_transcripts(args.requests), args.deadline))
+        if args.sync:
+            run_sync(_transcripts(args.requests), args.deadline, args.threads)
+
+    print()
+    for line in backend.METRICS.render().splitlines():
+        if line.startswith(("mindmap_route_total", "mindmap_deadline_exceeded")):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
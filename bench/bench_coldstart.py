@@ -0,0 +1,94 @@
+"""Cold-start cost of the backend: import time and time to first response.
+
+    python bench/bench_coldstart.py --runs 10 [--client stub|fake] [--warmup]
+
+Every run is a fresh interpreter that imports `backend`, then answers two
+different transcripts through the handler over an in-memory socket (see
+bench_pipeline).  The first answer is the cold path a serverless instance
+pays once; the second shows the warm cost for comparison.  `--client stub`
+uses the in-process `StubClient` (backend overhead only); `--client fake`
+uses the real OpenAI client against `fake_openai`'s HTTP server, so the
+`openai` import and connection setup are included.  `--warmup` calls
+`backend.warmup()` between import and the first request.  Medians over all
+runs are printed; bytecode caching follows the environment
+(PYTHONDONTWRITEBYTECODE), so compare like with like.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def child(client: str, warm: bool) -> None:
+    """One cold start; prints its timings (ms) as a JSON line."""
+    sys.path.insert(0, os.path.join(HERE, "..", "api"))
+    sys.path.insert(0, HERE)
+    start = time.perf_counter()
+    import backend
+    timings = {"import": time.perf_counter() - start}
+
+    from bench_pipeline import _MemorySocket, _QuietHandler, _http_request
+    from fake_openai import StubClient
+
+    if client == "stub":
+        backend.CLIENT = StubClient()
+    if warm:
+        mark = time.perf_counter()
+        backend.warmup()
+        timings["warmup"] = time.perf_counter() - mark
+    for name in ("first", "second"):
+        body = json.dumps({"text": f"{name} request about the budget and the hiring plan"})
+        mark = time.perf_counter()
+        _QuietHandler(_MemorySocket(_http_request(body.encode())), ("bench", 0), None)
+        timings[name] = time.perf_counter() - mark
+    print(json.dumps({k: round(v * 1000, 2) for k, v in timings.items()}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--client", choices=("stub", "fake"), default="stub")
+    parser.add_argument("--warmup", action="store_true", help="call backend.warmup() first")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.client, args.warmup)
+        return
+
+    env = dict(os.environ, OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "bench"))
+    env.pop("MINDMAP_WARMUP", None)
+    env.pop("MINDMAP_CACHE_DB", None)
+    if args.client == "fake":
+        from fake_openai import serve
+
+        server = serve()
+        env["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    command = [sys.executable, os.path.abspath(__file__), "--child", "--client", args.client]
+    if args.warmup:
+        command.append("--warmup")
+    runs = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        out = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        result["process"] = round((time.perf_counter() - start) * 1000, 2)
+        runs.append(result)
+
+    print(f"{args.runs} cold starts, {args.client} client"
+          f"{', warmed up' if args.warmup else ''}, "
+          f"bytecode cache {'off' if env.get('PYTHONDONTWRITEBYTECODE') else 'on'}")
+    for name in runs[0]:
+        values = [run[name] for run in runs]
+        print(f"{name:<8} median {statistics.median(values):>8.1f} ms   "
+              f"min {min(values):>8.1f} ms   max {max(values):>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
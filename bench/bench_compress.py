@@ -0,0 +1,63 @@
+"""Throughput of the local extractive compressor on synthetic transcripts.
+
+    python bench/bench_compress.py --sizes 1 4 16 --ratio 0.3
+
+Transcripts are generated from a fixed seed: unpunctuated caption-style
+runs that drift between a handful of topics, like a long meeting.  For each
+size the best of `--repeat` runs is reported in MB/s of input.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+import backend  # noqa: E402
+
+FILLER = "so um you know i think we should yeah and then like the of to it is".split()
+
+
+def synthetic_transcript(size_bytes: int, topics: int = 12, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    vocab = [
+        ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(4, 9))) for _ in range(40)]
+        for _ in range(topics)
+    ]
+    words, size, topic = [], 0, 0
+    while size < size_bytes:
+        if rng.random() < 0.02:  # drift to another topic now and then
+            topic = rng.randrange(topics)
+        for _ in range(rng.randint(6, 14)):
+            word = rng.choice(vocab[topic]) if rng.random() < 0.45 else rng.choice(FILLER)
+            words.append(word)
+            size += len(word) + 1
+    return " ".join(words)[:size_bytes]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=float, nargs="+", default=[0.25, 1, 4, 16],
+                        help="transcript sizes in MB")
+    parser.add_argument("--ratio", type=float, default=0.3)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'size MB':>8} {'sentences':>10} {'best s':>8} {'MB/s':>8} {'kept':>6}")
+    for mb in args.sizes:
+        text = synthetic_transcript(int(mb * 1_000_000))
+        best, out = float("inf"), ""
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            out = backend.compress_transcript(text, args.ratio)
+            best = min(best, time.perf_counter() - start)
+        sentences = len(backend._sentences(text))
+        print(f"{mb:>8.2f} {sentences:>10} {best:>8.3f} {mb / best:>8.2f} "
+              f"{len(out) / len(text):>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
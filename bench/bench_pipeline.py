@@ -0,0 +1,120 @@
+"""Per-stage cost of the backend request pipeline, without OpenAI.
+
+    python bench/bench_pipeline.py --sizes 1 10 100 1000 --latency 0
+
+`backend.CLIENT` is swapped for `StubClient`, so timings are backend
+overhead only (plus `--latency` ms of simulated model time per call).
+Transcripts are `SAMPLE_TRANSCRIPT` scaled to each size in KB.  Every
+stage of `handler.do_POST` is timed on its own, then the handler is
+driven end-to-end over an in-memory socket; a second, traced pass records
+peak allocations per stage.  The result caches are disabled so
+every request reaches `build_map`'s generation path.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+import backend  # noqa: E402
+from fake_openai import StubClient  # noqa: E402
+
+
+class _MemorySocket:
+    """Just enough of a socket for `StreamRequestHandler`."""
+
+    def __init__(self, request: bytes):
+        self._in = io.BytesIO(request)
+        self.sent = bytearray()
+
+    def makefile(self, mode, *_args, **_kwargs):
+        return self._in
+
+    def sendall(self, data):
+        self.sent += data
+
+    def settimeout(self, _timeout):
+        pass
+
+
+class _QuietHandler(backend.handler):
+    def log_message(self, *args):
+        pass
+
+
+def _http_request(body: bytes) -> bytes:
+    head = (
+        "POST /api/backend HTTP/1.1\r\nHost: bench\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n"
+    )
+    return head.encode() + body
+
+
+def _transcript(size_bytes: int) -> str:
+    sample = backend.SAMPLE_TRANSCRIPT
+    return (sample * (size_bytes // len(sample) + 1))[:size_bytes]
+
+
+def stages(body: bytes, canned: str) -> dict:
+    """name → zero-arg callable, mirroring `do_POST` step by step."""
+    text = json.loads(body)["text"]
+    mindmap = backend.MindMap.model_validate_json(canned)
+    return {
+        "read body": lambda: backend._read_json_object(
+            backend._body_chunks(io.BytesIO(body), {"content-length": str(len(body))})),
+        "normalize": lambda: backend._clean(text),
+        "build_map": lambda: backend.build_map(text),
+        "validate": lambda: backend.MindMap.model_validate_json(canned),
+        "serialize": lambda: backend.to_json(mindmap),
+        "end-to-end": lambda: _QuietHandler(_MemorySocket(_http_request(body)), ("bench", 0), None),
+    }
+
+
+def measure(fn, repeat: int) -> "tuple[float, float]":
+    """(median seconds, peak traced bytes) for `fn`."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times), peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000],
+                        help="transcript sizes in KB")
+    parser.add_argument("--latency", type=float, default=0.0, help="stub model latency in ms")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    stub = StubClient(latency=args.latency / 1000)
+    backend.CLIENT = stub
+    backend._CACHE = backend._ResultCache(max_entries=0, ttl_s=0)
+    backend.NEAR_DUP = False
+
+    for kb in args.sizes:
+        body = json.dumps({"text": _transcript(kb * 1000)}).encode()
+        print(f"\n── {kb} KB transcript ({len(body)} byte body) ──")
+        print(f"{'stage':<12} {'median':>12} {'peak alloc':>12}")
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+            results = {name: measure(fn, args.repeat) for name, fn in stages(body, stub.content).items()}
+        for name, (seconds, peak) in results.items():
+            print(f"{name:<12} {seconds * 1e6:>10.1f}µs {peak / 1024:>10.1f}KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Rate-limit scheduling against a simulated provider quota, without OpenAI.
+
+    python bench/bench_ratelimit.py --rpm 1200 --tpm 3600000 --batch 300 --live-rps 4
+
+The provider is a `StubClient` that enforces an RPM/TPM quota the way the
+real API does (per model, over a short window) and answers 429 beyond it.
+A batch backfill of `--batch` transcripts and a steady stream of live
+requests (`--live-rps`) run at the same time, first with the scheduler off
+and then with `backend.RATE_LIMIT_RPM/TPM` set to the quota.  Reported per
+phase: 429s, batch throughput, live latency and how many live requests had
+to fall back to the local engine.  The result caches are disabled.
+"""
+
+import argparse
+import contextlib
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+import backend  # noqa: E402
+from fake_openai import StubClient  # noqa: E402
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__("rate limit exceeded")
+        self.response = SimpleNamespace(headers={"retry-after": f"{retry_after:.2f}"})
+
+
+class QuotaClient(StubClient):
+    """`StubClient` that rejects calls over `rpm`/`tpm` with a 429.  Budget
+    refills continuously and holds `window_s` seconds' worth, like the
+    provider's short-window enforcement."""
+
+    def __init__(self, rpm: int, tpm: int, window_s: float, latency: float):
+        super().__init__(latency=latency)
+        self.limits = {"requests": rpm, "tokens": tpm}
+        self.window_s = window_s
+        self.rejected = 0
+        self._buckets: dict = {}
+        self._lock = threading.Lock()
+
+    def create(self, *, model, messages, **kwargs):
+        cost = {"requests": 1,
+                "tokens": sum(len(m["content"]) for m in messages) // 4 + len(self.content) // 4}
+        now = time.monotonic()
+        with self._lock:
+            wait = 0.0
+            levels = {}
+            for kind, limit in self.limits.items():
+                rate, capacity = limit / 60, limit / 60 * self.window_s
+                level, at = self._buckets.get((model, kind), (capacity, now))
+                levels[kind] = min(capacity, level + (now - at) * rate)
+                wait = max(wait, (cost[kind] - levels[kind]) / rate)
+            if wait > 0:
+                self.rejected += 1
+                for kind in self.limits:
+                    self._buckets[(model, kind)] = (levels[kind], now)
+                raise RateLimitError(wait)
+            for kind in self.limits:
+                self._buckets[(model, kind)] = (levels[kind] - cost[kind], now)
+        return super().create(model=model, messages=messages, **kwargs)
+
+
+def _transcript(chars: int) -> str:
+    sample = backend.SAMPLE_TRANSCRIPT
+    return uuid.uuid4().hex + " " + (sample * (chars // len(sample) + 1))[:chars]
+
+
+def phase(label: str, args, limited: bool) -> None:
+    backend.RATE_LIMIT_RPM = args.rpm if limited else 0
+    backend.RATE_LIMIT_TPM = args.tpm if limited else 0
+    backend._LIMITERS.clear()
+    backend._BREAKERS.clear()
+    backend._LATENCIES.clear()
+    stub = QuotaClient(args.rpm, args.tpm, args.window_s, args.latency)
+    backend.CLIENT = stub
+
+    live, fallbacks, stop = [], [0], threading.Event()
+
+    def one_live():
+        backend._LOCAL.set("")
+        start = time.perf_counter()
+        backend.build_map(_transcript(args.chars), None, args.deadline)
+        live.append(time.perf_counter() - start)
+        fallbacks[0] += bool(backend._LOCAL.get())
+
+    def live_traffic():
+        threads = []
+        while not (stop.is_set() and len(threads) >= 5):
+            threads.append(threading.Thread(target=one_live))
+            threads[-1].start()
+            time.sleep(1 / args.live_rps)
+        for thread in threads:
+            thread.join()
+
+    items = ({"id": i, "text": _transcript(args.chars)} for i in range(args.batch))
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+        feeder = threading.Thread(target=live_traffic)
+        feeder.start()
+        results = list(backend.build_batch(items, workers=args.workers))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        feeder.join()
+    ok = sum("map" in r and "local" not in r for r in results)
+    ordered = sorted(live)
+    print(f"{label:<12} {stub.rejected:>6} {ok:>5}/{len(results):<5} {ok / elapsed:>8.1f}/s "
+          f"{statistics.median(live) * 1000:>8.0f}ms {ordered[int(0.95 * len(ordered))] * 1000:>8.0f}ms "
+          f"{fallbacks[0]:>5}/{len(live):<5}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rpm", type=int, default=1200)
+    parser.add_argument("--tpm", type=int, default=3_600_000)
+    parser.add_argument("--window-s", type=float, default=backend.RATE_LIMIT_BURST_S,
+                        help="seconds of quota the provider lets through at once")
+    parser.add_argument("--batch", type=int, default=300, help="backfill transcripts")
+    parser.add_argument("--workers", type=int, default=8, help="batch workers")
+    parser.add_argument("--live-rps", type=float, default=4, help="live requests per second")
+    parser.add_argument("--chars", type=int, default=12_000, help="characters per transcript")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per completion")
+    parser.add_argument("--deadline", type=float, default=10, help="live request deadline (s)")
+    args = parser.parse_args()
+
+    backend._CACHE = backend._ResultCache(max_entries=0, ttl_s=0)
+    backend.NEAR_DUP = False
+    print(f"{'scheduler':<12} {'429s':>6} {'batch ok':>11} {'rate':>10} "
+          f"{'live p50':>10} {'live p95':>10} {'local':>11}")
+    phase("off", args, limited=False)
+    phase("on", args, limited=True)
+
+    print()
+    for line in backend.METRICS.render().splitlines():
+        if line.startswith(("mindmap_ratelimit_wait_seconds_sum", "mindmap_ratelimit_wait_seconds_count",
+                            "mindmap_ratelimit_timeouts", "mindmap_ratelimit_429")):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
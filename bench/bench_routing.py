@@ -0,0 +1,94 @@
+"""Model-tier routing under synthetic latency profiles, without OpenAI.
+
+    python bench/bench_routing.py --fast-ms 20 --quality-ms 200 --deadline-ms 1000
+
+`backend.CLIENT` is swapped for a `StubClient` whose latency depends on the
+model it is asked for, and the routing priors are set to the same profile.
+A simulated meeting (interim updates, then a final pass) and a burst of
+one-off transcripts are sent through `build_map`; then the quality tier
+slows down by `--slowdown`× and the burst is repeated, so routing can be
+seen moving large requests to the fast tier once the slowdown opens the
+quality tier's circuit or shows in its observed latencies.  The result
+caches are disabled.
+"""
+
+import argparse
+import contextlib
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+import backend  # noqa: E402
+from fake_openai import StubClient  # noqa: E402
+
+
+def _transcript(chars: int, salt: str) -> str:
+    sample = backend.SAMPLE_TRANSCRIPT
+    return salt + " " + (sample * (chars // len(sample) + 1))[:chars]
+
+
+def run(label: str, stub: StubClient, requests: list, deadline_s: float) -> None:
+    """Send `(text, meeting_id, final)` requests one by one and report."""
+    before = dict(stub.models)
+    times, errors = [], 0
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+        for text, meeting_id, final in requests:
+            start = time.perf_counter()
+            try:
+                backend.build_map(text, meeting_id, deadline_s, final)
+            except (backend.DeadlineExceeded, backend.CircuitOpenError):
+                errors += 1
+            times.append(time.perf_counter() - start)
+    calls = {tier: stub.models.get(model, 0) - before.get(model, 0)
+             for tier, model in backend.MODEL_TIERS.items()}
+    print(f"{label:<22} {len(requests):>4} {calls['fast']:>6} {calls['quality']:>8} "
+          f"{statistics.median(times) * 1000:>8.0f}ms {max(times) * 1000:>8.0f}ms {errors:>6}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fast-ms", type=float, default=20)
+    parser.add_argument("--quality-ms", type=float, default=200)
+    parser.add_argument("--deadline-ms", type=float, default=1000)
+    parser.add_argument("--slowdown", type=float, default=6.0,
+                        help="quality-tier latency multiplier for the last phase")
+    parser.add_argument("--requests", type=int, default=40, help="one-off requests per burst")
+    args = parser.parse_args()
+
+    fast, quality = backend.MODEL_TIERS["fast"], backend.MODEL_TIERS["quality"]
+    stub = StubClient(latency={fast: args.fast_ms / 1000, quality: args.quality_ms / 1000})
+    backend.CLIENT = stub
+    backend.TIER_PRIOR_S = {"fast": args.fast_ms / 1000, "quality": args.quality_ms / 1000}
+    backend._CACHE = backend._ResultCache(max_entries=0, ttl_s=0)
+    backend.NEAR_DUP = False
+    deadline_s = args.deadline_ms / 1000
+
+    meeting = str(uuid.uuid4())
+    spoken = [_transcript(300 * (i + 1), meeting) for i in range(10)]
+    meeting_requests = [(text, meeting, False) for text in spoken] + [(spoken[-1], meeting, True)]
+
+    def burst():
+        small = [(_transcript(1_000, uuid.uuid4().hex), None, False) for _ in range(args.requests // 2)]
+        large = [(_transcript(20_000, uuid.uuid4().hex), None, False) for _ in range(args.requests // 2)]
+        return small + large
+
+    print(f"{'phase':<22} {'reqs':>4} {'fast':>6} {'quality':>8} {'p50':>10} {'max':>10} {'errors':>6}")
+    run("meeting + final", stub, meeting_requests, deadline_s)
+    run("one-off burst", stub, burst(), deadline_s)
+    stub.latency[quality] *= args.slowdown
+    run(f"quality {args.slowdown:g}x slower", stub, burst(), deadline_s)
+    run("  …after it shows", stub, burst(), deadline_s)
+
+    print()
+    for line in backend.METRICS.render().splitlines():
+        if line.startswith("mindmap_route"):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Stand-in for the OpenAI chat-completions API, for offline runs.
+
+Answers `POST /v1/chat/completions` with a canned mind-map after a fixed
+delay (or, with `"stream": true`, as SSE chunks spread over that delay), so the backend's client, pooling and concurrency code can be driven
+without a network or an API key:
+
+    python bench/fake_openai.py --port 8089 --latency 0.5
+    OPENAI_BASE_URL=http://localhost:8089/v1 OPENAI_API_KEY=x python ...
+
+`StubClient` is the in-process equivalent: assign it to `backend.CLIENT`
+to take the network out of a measurement entirely.
+"""
+
+import argparse
+import json
+import time
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_MAP = {
+    "nodes": [
+        {"id": "meeting", "label": "Weekly Sync", "importance": 5},
+        {"id": "budget", "label": "Budget Review", "importance": 3},
+        {"id": "approve-budget", "label": "Approve Q3 Budget", "importance": 1},
+        {"id": "hiring", "label": "Hiring Plan", "importance": 3},
+    ],
+    "edges": [
+        {"source": "meeting", "target": "budget", "relation": "includes", "weight": 3},
+        {"source": "budget", "target": "approve-budget", "relation": "includes", "weight": 1},
+        {"source": "meeting", "target": "hiring", "relation": "includes", "weight": 3},
+    ],
+}
+
+
+class StubClient:
+    """Duck-typed `OpenAI` client: `chat.completions.create` sleeps for
+    `latency` seconds and returns `content` (the canned map by default).
+
+    `latency` may also be a `{model: seconds}` profile, to give each model
+    tier its own speed; `.models` counts the calls per model."""
+
+    def __init__(self, latency: "float | dict[str, float]" = 0.0, content: str | None = None):
+        self.latency = latency
+        self.content = content if content is not None else json.dumps(CANNED_MAP)
+        self.calls = 0
+        self.models: dict[str, int] = {}
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, *, model, messages, **_):
+        self.calls += 1
+        self.models[model] = self.models.get(model, 0) + 1
+        latency = self.latency.get(model, 0.0) if isinstance(self.latency, dict) else self.latency
+        if latency:
+            time.sleep(latency)
+        prompt_chars = sum(len(m.get("content") or "") for m in messages)
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(message=SimpleNamespace(content=self.content))],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_chars // 4,
+                completion_tokens=len(self.content) // 4,
+                total_tokens=(prompt_chars + len(self.content)) // 4,
+            ),
+        )
+
+
+class FakeCompletions(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    latency = 0.0
+    content = json.dumps(CANNED_MAP)
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("content-length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if request.get("stream"):
+            self._stream(request)
+            return
+        time.sleep(self.latency)
+
+        prompt_chars = sum(len(m.get("content") or "") for m in request.get("messages", []))
+        body = json.dumps({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_chars // 4,
+                "completion_tokens": len(self.content) // 4,
+                "total_tokens": (prompt_chars + len(self.content)) // 4,
+            },
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, request, pieces=20):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        step = max(1, len(self.content) // pieces)
+        for start in range(0, len(self.content), step):
+            time.sleep(self.latency / pieces)
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "fake"),
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": self.content[start:start + step]},
+                    "finish_reason": None,
+                }],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+def serve(port: int = 0, latency: float = 0.0) -> ThreadingHTTPServer:
+    """Start a fake server in the background; returns it (port in `server_address`)."""
+    import threading
+
+    handler = type("Handler", (FakeCompletions,), {"latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per completion")
+    args = parser.parse_args()
+    FakeCompletions.latency = args.latency
+    print(f"🤖 fake OpenAI on http://localhost:{args.port}/v1 ({args.latency}s latency)")
+    server = ThreadingHTTPServer(("0.0.0.0", args.port), FakeCompletions)
+    server.daemon_threads = True
+    server.serve_forever()
@@ -19,6 +19,11 @@ const USE_LOCAL_BACKEND = false;   // ← flip to true for localhost:5001
 const BACKEND_ENDPOINT  = USE_LOCAL_BACKEND
   ? "http://localhost:5001/api/backend"
   : "/api/backend";                // default Next.js route
+// Push ingestion needs the long-running local server (a serverless function
+// cannot hold a WebSocket): fragments go up as they are recognised and the
+// backend pushes a map back when enough has changed.  Off → poll every 15 s.
+const USE_PUSH_INGEST = false;
+const PUSH_ENDPOINT   = "ws://localhost:5001/api/backend/push";
 
 // ✨ 2. utility that re-uses existing objects so their x/y stay intact
 const mergeGraphData = (
@@ -65,6 +70,31 @@ const mergeGraphData = (
   return { nodes: mergedNodes, edges: mergedEdges };
 };
 
+// Delta replies from the backend: what changed since the version we hold
+type GraphDiff<T, K> = { added: T[]; removed: K[]; changed: T[] };
+type GraphDelta = {
+  nodes: GraphDiff<NodeType, string>;
+  edges: GraphDiff<EdgeType, { source: string; target: string }>;
+};
+
+// ✨ 3. rebuild the full incoming map from our copy plus a delta
+const applyDelta = (prev: MindMapData, delta: GraphDelta): MindMapData => {
+  const id = (v: any) => (typeof v === "object" ? v.id : v); // FG swaps ids for objects
+  const edgeKey = (e: { source: any; target: any }) => `${id(e.source)}->${id(e.target)}`;
+
+  const nodes = new Map(prev.nodes.map((n) => [n.id as string, { ...n }]));
+  delta.nodes.removed.forEach((nodeId) => nodes.delete(nodeId));
+  [...delta.nodes.changed, ...delta.nodes.added].forEach((n) => nodes.set(n.id as string, n));
+
+  const edges = new Map(
+    prev.edges.map((e) => [edgeKey(e), { ...e, source: id(e.source), target: id(e.target) }]),
+  );
+  delta.edges.removed.forEach((e) => edges.delete(edgeKey(e)));
+  [...delta.edges.changed, ...delta.edges.added].forEach((e) => edges.set(edgeKey(e), e));
+
+  return { nodes: [...nodes.values()], edges: [...edges.values()] };
+};
+
 export default function AppPage() {
   const [isRecording, setIsRecording] = useState(false);
   const [timer, setTimer] = useState("00:00:00");
@@ -84,6 +114,12 @@ export default function AppPage() {
   // Pump state for backend sync
   const intervalRef = useRef<NodeJS.Timeout | null>(null);
   const transcriptRef = useRef<string>("");
+  // Lets the backend send the model only what was said since the last update
+  const meetingIdRef = useRef<string>("");
+  // Graph version we hold; the backend answers 304 or a delta against it
+  const versionRef = useRef<number | null>(null);
+  // Open push connection (USE_PUSH_INGEST), null while polling
+  const socketRef = useRef<WebSocket | null>(null);
 
   /* ────────── layout-debug refs & logger ────────── */
   const mainRef    = useRef<HTMLElement>(null);
@@ -155,6 +191,9 @@ export default function AppPage() {
     try {
       // Reset state
       setTranscript([]);
+      transcriptRef.current = "";
+      meetingIdRef.current = crypto.randomUUID();
+      versionRef.current = null;
       audioChunksRef.current = [];
       timeoutsRef.current.forEach((timeout) => clearTimeout(timeout));
       timeoutsRef.current = [];
@@ -195,8 +234,9 @@ export default function AppPage() {
       // Start speech recognition
       startSpeechRecognition();
 
-      // Start backend pump
-      startBackendPump();
+      // Start backend pump (or the push connection that replaces it)
+      if (USE_PUSH_INGEST) openPushSocket();
+      else startBackendPump();
     } catch (error) {
       console.error("Error starting recording:", error);
       alert("Could not access microphone. Please check permissions.");
@@ -249,9 +289,12 @@ export default function AppPage() {
 
     // Stop backend pump and send final payload immediately
     stopBackendPump();
-    if (transcriptRef.current.length > 0) {
+    if (socketRef.current) {
+      socketRef.current.send(JSON.stringify({ type: "final" }));
+      socketRef.current = null; // the backend closes it after the final map
+    } else if (transcriptRef.current.length > 0) {
       console.log("▶️ sending final transcript (", transcriptRef.current.length, "chars )");
-      sendToBackend(transcriptRef.current);
+      sendToBackend(transcriptRef.current, true);
     }
   };
 
@@ -296,6 +339,7 @@ export default function AppPage() {
             transcriptRef.current = newTranscript.join(" ");
             return newTranscript;
           });
+          pushFragment(transcript);
         }
       }
     };
@@ -324,29 +368,85 @@ export default function AppPage() {
   const debounceTimerRef = useRef<NodeJS.Timeout | null>(null);
 
   // Send transcript to backend every 15 s while recording (simple throttle)
-  const sendToBackend = async (text: string) => {
+  const sendToBackend = async (text: string, final = false) => {
     if (text.length < 50) return; // skip tiny payloads
     const t0 = performance.now();
     try {
       const res = await fetch(BACKEND_ENDPOINT, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ text }),
+        body: JSON.stringify({
+          text,
+          meeting_id: meetingIdRef.current,
+          since: versionRef.current,
+          final, // last pass → backend uses its quality model tier
+        }),
       });
-      const data = await res.json();
       const ms = Math.round(performance.now() - t0);
+      if (res.headers.get("X-Mindmap-Local") === "speculative" && !final) {
+        // Quick local draft: the real map lands shortly, ask again soon.
+        setTimeout(() => sendToBackend(transcriptRef.current), 3000);
+      }
+      if (res.status === 304) {
+        console.log(`⏱ round-trip ${ms} ms (unchanged)`);
+        return;
+      }
+      const reply = await res.json();
       console.log(`⏱ round-trip ${ms} ms`);
-      console.log("🧩 received", data.nodes.length, "nodes /", data.edges.length, "edges");
-      data.nodes.forEach((n: any) => console.log("node:", n.id, "→", n.label));
-      data.edges.forEach((e: any) =>
-        console.log("edge:", e.source, "--(", e.relation || "", ")→", e.target)
-      );
-      setGraphData((prev) => mergeGraphData(prev, data));
+      applyReply(reply);
     } catch (err) {
       console.error("🚨 backend fetch failed", err);
     }
   };
 
+  // A full map or a delta against versionRef, from a poll or a push
+  const applyReply = (reply: any) => {
+    if (reply.version !== undefined) versionRef.current = reply.version;
+    if (reply.delta) {
+      setGraphData((prev) => mergeGraphData(prev, applyDelta(prev, reply.delta)));
+      return;
+    }
+    const data = reply;
+    console.log("🧩 received", data.nodes.length, "nodes /", data.edges.length, "edges");
+    data.nodes.forEach((n: any) => console.log("node:", n.id, "→", n.label));
+    data.edges.forEach((e: any) =>
+      console.log("edge:", e.source, "--(", e.relation || "", ")→", e.target)
+    );
+    setGraphData((prev) => mergeGraphData(prev, data));
+  };
+
+  const openPushSocket = () => {
+    const url = `${PUSH_ENDPOINT}?meeting_id=${meetingIdRef.current}`;
+    const socket = new WebSocket(url);
+    socketRef.current = socket;
+    // Anything said before the socket opened goes up as the first fragment
+    socket.onopen = () => pushFragment(transcriptRef.current);
+    socket.onmessage = (event) => {
+      const message = JSON.parse(event.data);
+      if (message.type === "map") {
+        console.log(`📡 pushed map (${message.reason})`);
+        applyReply(message);
+      } else if (message.type === "error") {
+        console.error("🚨 backend push failed", message.error);
+      }
+    };
+    socket.onclose = () => {
+      if (socketRef.current !== socket) return; // closed after the final map
+      socketRef.current = null;
+      if (isRecordingRef.current) {
+        console.warn("🔌 push connection lost; polling instead");
+        startBackendPump();
+      }
+    };
+  };
+
+  const pushFragment = (text: string) => {
+    const socket = socketRef.current;
+    if (socket?.readyState === WebSocket.OPEN && text) {
+      socket.send(JSON.stringify({ type: "append", text }));
+    }
+  };
+
   const startBackendPump = () => {
     if (intervalRef.current) return;
     intervalRef.current = setInterval(() => {
@@ -384,11 +484,13 @@ export default function AppPage() {
 
       if (index < transcriptPhrases.length) {
         // Add the transcript line immediately to ensure it appears
+        const phrase = transcriptPhrases[index];
         setTranscript((prev) => {
-          const newTranscript = [...prev, transcriptPhrases[index]];
+          const newTranscript = [...prev, phrase];
           transcriptRef.current = newTranscript.join(" ");
           return newTranscript;
         });
+        pushFragment(phrase);
         index++;
 
         // Continue adding lines at random intervals if still recording